@@ -0,0 +1,266 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from class_enrichment_cache import linkedin_slug, normalize_domain, normalize_email
+
+class TokenBucket:
+    def __init__(self, rate_per_minute=50, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, rate_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        # Apollo reports the account's quota on every response; follow it instead of guessing
+        limit = headers.get("x-rate-limit-minute")
+        remaining = headers.get("x-minute-requests-left")
+        with self.lock:
+            if limit and limit.isdigit() and int(limit) > 0:
+                self.rate = int(limit) / 60.0
+                self.capacity = max(1, int(limit) // 6)
+            if remaining and remaining.isdigit():
+                self.refill()
+                self.tokens = min(self.tokens, float(remaining))
+
+    def drain(self):
+        with self.lock:
+            self.refill()
+            self.tokens = 0.0
+
+class ApolloClient:
+    base_url = "https://api.apollo.io"
+    retry_statuses = {429, 500, 502, 503, 504}
+    # Apollo's bulk match/enrich endpoints accept at most 10 records per call
+    bulk_size = 10
+
+    def __init__(self, api_key, max_workers=8, requests_per_minute=50, max_retries=5, backoff=1.0, timeout=30, cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(requests_per_minute)
+
+        # One pooled session shared by every worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            'Cache-Control': 'no-cache',
+            'Content-Type': 'application/json'
+        })
+
+    def retry_delay(self, response, attempt):
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return int(retry_after) + random.uniform(0, self.backoff)
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def request(self, method, path, params=None, json=None):
+        url = f"{self.base_url}{path}"
+        response = None
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, params=params, json=json, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Request to {path} failed: {str(e)}")
+                response = None
+            else:
+                self.rate_limiter.update_from_headers(response.headers)
+                if response.status_code not in self.retry_statuses:
+                    return response
+                if response.status_code == 429:
+                    self.rate_limiter.drain()
+
+            if attempt < self.max_retries:
+                delay = self.retry_delay(response, attempt)
+                status = response.status_code if response is not None else "connection error"
+                print(f"Retrying {path} in {delay:.1f}s after {status} (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+        return response
+
+    def cached_request(self, keys, method, path, params=None, json=None, check_cache=True):
+        keys = [key for key in keys if key]
+        if self.cache is not None and keys and check_cache:
+            cached = self.cache.get(keys)
+            if cached is not None:
+                return cached
+
+        response = self.request(method, path, params=params, json=json)
+        if response is None or response.status_code != 200:
+            return None
+
+        data = response.json()
+        if self.cache is not None and keys:
+            self.cache.set(keys, path, data)
+        return data
+
+    def person_keys(self, detail):
+        # Names alone are not unique, so only email and LinkedIn slug are used as cache keys
+        email_key = normalize_email(detail.get("email"))
+        slug = linkedin_slug(detail.get("linkedin_url"))
+        return [key for key in [f"email:{email_key}" if email_key else None, f"linkedin:{slug}" if slug else None] if key]
+
+    def organization_keys(self, domain):
+        domain_key = normalize_domain(domain)
+        return [f"domain:{domain_key}"] if domain_key else []
+
+    def people_match(self, first_name=None, last_name=None, email=None, linkedin_url=None, check_cache=True):
+        detail = {
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "linkedin_url": linkedin_url
+        }
+        data = {"api_key": self.api_key, **detail, "reveal_personal_emails": True}
+        return self.cached_request(self.person_keys(detail), "POST", "/v1/people/match", json=data, check_cache=check_cache)
+
+    def organization_enrich(self, domain, check_cache=True):
+        querystring = {
+            "api_key": self.api_key,
+            "domain": domain
+        }
+        return self.cached_request(self.organization_keys(domain), "GET", "/v1/organizations/enrich", params=querystring, check_cache=check_cache)
+
+    def mixed_people_search(self, domain, role, page=1, per_page=100):
+        data = {
+            "api_key": self.api_key,
+            "q_organization_domains": domain,
+            "page": page,
+            "per_page": per_page,
+            "person_titles": [role]
+        }
+        domain_key = normalize_domain(domain)
+        keys = [f"search:{domain_key}:{role.strip().lower()}:{page}:{per_page}" if domain_key else None]
+        return self.cached_request(keys, "POST", "/v1/mixed_people/search", json=data)
+
+    def people_bulk_match_batch(self, details):
+        data = {
+            "api_key": self.api_key,
+            "details": details,
+            "reveal_personal_emails": True
+        }
+        response = self.request("POST", "/v1/people/bulk_match", json=data)
+        if response is None or response.status_code != 200:
+            return None
+
+        # Matches come back in request order, with null for records Apollo could not match
+        matches = response.json().get("matches")
+        if not isinstance(matches, list) or len(matches) != len(details):
+            return None
+        # An unmatched record gets the same shape as a /v1/people/match miss; None is kept for failed requests
+        return [{"person": match or None} for match in matches]
+
+    def organizations_bulk_enrich_batch(self, domains):
+        data = {
+            "api_key": self.api_key,
+            "domains": domains
+        }
+        response = self.request("POST", "/v1/organizations/bulk_enrich", json=data)
+        if response is None or response.status_code != 200:
+            return None
+
+        organizations = response.json().get("organizations")
+        if not isinstance(organizations, list):
+            return None
+
+        # Organizations are not guaranteed to be in request order, so line them up by domain
+        by_domain = {}
+        for organization in organizations:
+            if organization:
+                for field in ["primary_domain", "website_url"]:
+                    domain_key = normalize_domain(organization.get(field))
+                    if domain_key:
+                        by_domain.setdefault(domain_key, {"organization": organization})
+
+        # An alias or redirect comes back under its primary domain, so those inputs are looked up one at a time
+        results = [by_domain.get(normalize_domain(domain)) for domain in domains]
+        for index, domain in enumerate(domains):
+            if results[index] is None:
+                results[index] = self.organization_enrich(domain, check_cache=False)
+        return results
+
+    def bulk_lookup(self, items, keys_for, fetch_batch, fetch_single, path):
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            keys = keys_for(item)
+            cached = self.cache.get(keys) if self.cache is not None and keys else None
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append(index)
+
+        def run_batch(indexes):
+            batch = [items[index] for index in indexes]
+            batch_results = fetch_batch(batch)
+            if batch_results is None:
+                print(f"Bulk request to {path} failed for {len(batch)} records. Falling back to single requests...")
+                return [fetch_single(item) for item in batch]
+
+            if self.cache is not None:
+                for item, result in zip(batch, batch_results):
+                    keys = keys_for(item)
+                    if result is not None and keys:
+                        self.cache.set(keys, path, result)
+            return batch_results
+
+        batches = [pending[i:i + self.bulk_size] for i in range(0, len(pending), self.bulk_size)]
+        print(f"Sending {len(pending)} uncached records to {path} in {len(batches)} bulk requests...")
+        for indexes, batch_results in zip(batches, self.map_concurrent(run_batch, batches)):
+            for index, result in zip(indexes, batch_results):
+                results[index] = result
+        return results
+
+    def people_bulk_match(self, details):
+        return self.bulk_lookup(
+            details,
+            self.person_keys,
+            self.people_bulk_match_batch,
+            lambda detail: self.people_match(**detail, check_cache=False),
+            "/v1/people/bulk_match"
+        )
+
+    def organizations_bulk_enrich(self, domains):
+        return self.bulk_lookup(
+            domains,
+            self.organization_keys,
+            self.organizations_bulk_enrich_batch,
+            lambda domain: self.organization_enrich(domain, check_cache=False),
+            "/v1/organizations/bulk_enrich"
+        )
+
+    def map_concurrent(self, func, items):
+        # Results come back in input order so callers can line them up with their rows
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.report()
+            self.cache.close()
@@ -0,0 +1,97 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote
+
+def normalize_email(email):
+    if not isinstance(email, str) or "@" not in email:
+        return None
+    return email.strip().lower()
+
+def linkedin_slug(linkedin_url):
+    if not isinstance(linkedin_url, str):
+        return None
+    match = re.search(r"linkedin\.com/in/([^/?#\s]+)", linkedin_url, re.IGNORECASE)
+    return unquote(match.group(1)).strip().lower() if match else None
+
+def normalize_domain(website):
+    if not isinstance(website, str) or not website.strip():
+        return None
+    domain = re.sub(r"^[a-z]+://", "", website.strip().lower())
+    domain = domain.split("/")[0].split("?")[0].split(":")[0]
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain or None
+
+class EnrichmentCache:
+    def __init__(self, db_file="apollo_cache.sqlite", ttl_days=30, max_entries=100000, evict_every=1000):
+        self.db_file = db_file
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        # Eviction scans the table, so it runs every evict_every inserts and on close instead of on each set
+        self.evict_every = max(1, evict_every)
+        self.inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, endpoint TEXT, payload TEXT, created_at REAL, accessed_at REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_created_at ON cache (created_at)")
+        self.connection.commit()
+
+    def get(self, keys):
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                if not key:
+                    continue
+                row = self.connection.execute(
+                    "SELECT payload, created_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] < self.ttl:
+                    self.connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    self.connection.commit()
+                    self.hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+        return None
+
+    def set(self, keys, endpoint, payload):
+        now = time.time()
+        rows = [(key, endpoint, json.dumps(payload), now, now) for key in keys if key]
+        if not rows:
+            return
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows)
+            self.inserts += len(rows)
+            if self.inserts >= self.evict_every:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        # Drop expired entries first, then the least recently used ones above the size limit
+        self.inserts = 0
+        self.connection.execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,))
+        count = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        print(f"Enrichment cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)")
+
+    def close(self):
+        with self.lock:
+            self.evict()
+            self.connection.commit()
+            self.connection.close()
@@ -0,0 +1,132 @@
+import glob
+import json
+import os
+import time
+
+# Characters that can continue a number, e.g. "1" + ".5" or "2" + "e3"
+NUMBER_CHARS = set("0123456789+-.eE")
+
+def iter_json_array(file, chunk_size=65536):
+    # Decode the elements of a top-level JSON array one at a time instead of loading the whole file
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    eof = not buffer
+    position = len(buffer) - len(buffer.lstrip())
+    if not buffer[position:position + 1] == "[":
+        data = json.loads(buffer + file.read())
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+        return
+
+    position += 1
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+            # A value ending at the buffer edge may have been cut short, so read on first; a number
+            # can also stop early when the chunk ends on a "." or "e" that the next chunk completes
+            cut_number = isinstance(record, (int, float)) and not isinstance(record, bool) and set(buffer[end:]) <= NUMBER_CHARS
+            if (end == len(buffer) or cut_number) and not eof:
+                raise json.JSONDecodeError("Incomplete value", buffer, end)
+        except json.JSONDecodeError:
+            more = file.read(chunk_size)
+            if not more:
+                if eof or position >= len(buffer):
+                    raise
+                eof = True
+                continue
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+
+        yield record
+        buffer = buffer[end:]
+        position = 0
+
+def iter_json_records(file_path):
+    # Accept both the JSON array written by older runs and the JSON Lines output of newer ones
+    with open(file_path, "r") as file:
+        if file_path.lower().endswith(".jsonl"):
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(file)
+
+# The first checkpoint line can record which input the run was started on
+FINGERPRINT_PREFIX = "fingerprint:"
+
+def checkpoint_fingerprint(checkpoint_file):
+    with open(checkpoint_file, "r") as file:
+        first_line = file.readline().rstrip("\n")
+    return first_line[len(FINGERPRINT_PREFIX):] if first_line.startswith(FINGERPRINT_PREFIX) else None
+
+class ResumableJsonlWriter:
+    def __init__(self, output_file, fingerprint=None):
+        self.output_file = output_file
+        self.checkpoint_file = f"{output_file}.checkpoint"
+        self.completed_keys = set()
+        self.written = 0
+        resuming = os.path.exists(self.checkpoint_file)
+
+        # Pick up the keys processed by a previous, interrupted run
+        if resuming:
+            with open(self.checkpoint_file, "r") as file:
+                self.completed_keys = {
+                    line.rstrip("\n") for line in file if line.strip() and not line.startswith(FINGERPRINT_PREFIX)
+                }
+            print(f"Resuming {output_file}: {len(self.completed_keys)} records already processed.")
+
+        self.output = open(output_file, "a")
+        self.checkpoint = open(self.checkpoint_file, "a")
+        if not resuming and fingerprint:
+            self.checkpoint.write(f"{FINGERPRINT_PREFIX}{fingerprint}\n")
+            self.checkpoint.flush()
+
+    @classmethod
+    def resume_or_create(cls, prefix, fingerprint=None):
+        # Resume the most recent unfinished run on the same input, otherwise start a new epoch-stamped file
+        unfinished = sorted(
+            path[:-len(".checkpoint")] for path in glob.glob(f"{prefix}_*.jsonl.checkpoint")
+        )
+        if unfinished:
+            if fingerprint is None or checkpoint_fingerprint(f"{unfinished[-1]}.checkpoint") == fingerprint:
+                return cls(unfinished[-1], fingerprint)
+            print(f"Not resuming {unfinished[-1]}: the input has changed since that run started.")
+        return cls(f"{prefix}_{int(time.time())}.jsonl", fingerprint)
+
+    def is_done(self, key):
+        return key in self.completed_keys
+
+    def write(self, key, record):
+        # The record goes down before its key, so a crash can only cause a re-fetch, never a loss
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+        self.written += 1
+        self.mark_done(key)
+
+    def mark_done(self, key):
+        # For keys settled without a record, e.g. a definite no-match; failed lookups are left unmarked to be retried
+        self.checkpoint.write(f"{key}\n")
+        self.checkpoint.flush()
+        self.completed_keys.add(key)
+
+    def close(self, finished=True):
+        self.output.close()
+        self.checkpoint.close()
+        if finished and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Keep the checkpoint around when the run fails so the next run can resume
+        self.close(finished=exc_type is None)
@@ -0,0 +1,97 @@
+import glob
+import hashlib
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+INDIVIDUALS_SCHEMA = pa.schema([
+    ("Name", pa.string()),
+    ("Email", pa.string()),
+    ("LinkedIn", pa.string())
+])
+
+COMPANIES_SCHEMA = pa.schema([
+    ("Company", pa.string()),
+    ("Website", pa.string())
+])
+
+class LeadStore:
+    def __init__(self, path, schema, row_group_size=50000):
+        # A store is a directory of Parquet part files, so appends never rewrite existing data
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.legacy_pickle = f"{os.path.splitext(path)[0]}.pkl"
+
+    @classmethod
+    def individuals(cls, path="individuals_data.parquet"):
+        return cls(path, INDIVIDUALS_SCHEMA)
+
+    @classmethod
+    def companies(cls, path="companies_data.parquet"):
+        return cls(path, COMPANIES_SCHEMA)
+
+    def exists(self):
+        return os.path.isdir(self.path) and bool(self.part_files())
+
+    def part_files(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def fingerprint(self):
+        # Changes whenever a part file (or the legacy pickle) is added, rewritten or removed
+        files = self.part_files() if self.exists() else [self.legacy_pickle]
+        stats = [f"{os.path.basename(file)}:{os.path.getsize(file)}:{os.path.getmtime(file)}" for file in files if os.path.exists(file)]
+        return hashlib.sha256("|".join(stats).encode()).hexdigest()
+
+    def to_table(self, df):
+        # Coerce every column to the declared schema so all part files stay compatible
+        columns = {}
+        for field in self.schema:
+            values = df[field.name] if field.name in df.columns else pd.Series([None] * len(df), dtype=object)
+            columns[field.name] = [None if pd.isna(value) else str(value) for value in values]
+        return pa.Table.from_pydict(columns, schema=self.schema)
+
+    def write(self, df):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        self.write_part(df)
+
+    def append(self, df):
+        # Carry rows over from a pre-Parquet pickle before the first append so nothing is dropped
+        if not self.exists() and os.path.exists(self.legacy_pickle):
+            self.write_part(self.read_legacy_pickle())
+        return self.write_part(df)
+
+    def write_part(self, df):
+        os.makedirs(self.path, exist_ok=True)
+        part_file = os.path.join(self.path, f"part-{len(self.part_files()):05d}.parquet")
+        pq.write_table(self.to_table(df), part_file, row_group_size=self.row_group_size)
+        return part_file
+
+    def dataset(self):
+        return ds.dataset(self.part_files(), schema=self.schema, format="parquet")
+
+    def read(self, columns=None, filter=None):
+        # Only the requested columns are read, and row groups whose statistics rule out the filter are skipped
+        if not self.exists():
+            return self.read_legacy_pickle(columns)
+        return self.dataset().to_table(columns=columns, filter=filter).to_pandas()
+
+    def iter_batches(self, columns=None, filter=None, batch_size=1000):
+        if not self.exists():
+            df = self.read_legacy_pickle(columns)
+            for start in range(0, len(df), batch_size):
+                yield df.iloc[start:start + batch_size]
+            return
+        for batch in self.dataset().to_batches(columns=columns, filter=filter, batch_size=batch_size):
+            yield batch.to_pandas()
+
+    def read_legacy_pickle(self, columns=None):
+        if not os.path.exists(self.legacy_pickle):
+            raise FileNotFoundError(f"Neither {self.path} nor {self.legacy_pickle} exists. Run ingest.py first.")
+        print(f"Reading legacy pickle file: {self.legacy_pickle}")
+        df = pd.read_pickle(self.legacy_pickle)
+        return df[columns] if columns else df
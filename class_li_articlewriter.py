@@ -3,6 +3,7 @@ from playwright.sync_api import sync_playwright
 import anthropic
 from dotenv import load_dotenv
 import os
+from class_jsonl_store import iter_json_records
 
 load_dotenv()
 
@@ -20,8 +21,7 @@ class LinkedInArticleWriter:
             self.cookies = json.loads(cookies_data)
 
     def load_json_data(self):
-        with open(self.json_file, 'r') as file:
-            self.json_data = json.load(file)
+        self.json_data = list(iter_json_records(self.json_file))
 
     def get_person_keywords(self):
         persons = []
@@ -5,9 +5,54 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from class_li_waits import LinkedInWaiter
+from class_research_cache import ResearchCache
+from class_prompt_cache import PromptCacheStats, cached_block, text_block
 
 load_dotenv()
 
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+# Summaries run side by side; each request gets its own timeout so one slow source can't hold up the rest
+SUMMARY_WORKERS = 5
+SUMMARY_TIMEOUT = 90
+
+# Article searches stop at the target, after a few attempts or once the time budget is spent, whichever comes first
+RESEARCH_TARGET_URLS = 5
+RESEARCH_MAX_ATTEMPTS = 3
+RESEARCH_TIME_BUDGET = 120
+
+# Concrete signals on the article editor; LinkedIn keeps background requests open, so the network never goes idle
+ARTICLE_DRAFT_SAVED_SELECTOR = ".article-editor-toolbar__draft-status:has-text('Saved'), .article-editor-nav__draft-status:has-text('Saved')"
+
+# Static instructions shared by every article; cached together with the system prompt
+ARTICLE_SYSTEM_PROMPT = "You are an expert content marketer and business development executive that generates thought provoking articles for LinkedIn."
+
+ARTICLE_GUIDELINES = (
+    "The article should be coherent, and provide insight into a single theme that is most common in the summaries. Use appropriate hashtags. Divide the content into subsections with subheadings. There should be an introduction and conclusion with a call to action, but do not use the subheadings Introduction, Conclusion or Call To Action. Do not create a title. The tone should be professional, succinct and authoritative.\n\n"
+    "To optimize the article for SEO, follow these rules:\n"
+    "1. Find a primary keyword to target\n"
+    "2. Assess search intent\n"
+    "3. Assess your chances of ranking in Google\n"
+    "4. Research what people want to know\n"
+    "5. Optimize headings and subheadings\n"
+    "6. Hook readers with your intro (blog posts only)\n"
+    "7. Edit your copy for simplicity\n"
+    "8. Link to relevant resources\n"
+    "9. Make it easier to consume with images\n"
+    "10. Optimize your images\n"
+    "11. Set a compelling title tag and meta description\n"
+    "12. Set an SEO-friendly URL slug\n"
+    "13. Add schema markup for rich snippets\n"
+    "14. Add a table of contents (blog posts only)\n\n"
+    "The article MUST be written with Markdown formatting."
+)
+
+# Title and summary share a system prompt so the article block is one cached prefix for both calls
+ARTICLE_META_SYSTEM_PROMPT = "You are an expert content marketer and business development executive that generates eye catching, clickable titles and thought-provoking, engaging summaries for LinkedIn articles."
+
 class LinkedInArticleWriter:
     def __init__(self, cookies_file):
         self.cookies_file = cookies_file
@@ -15,6 +60,11 @@ class LinkedInArticleWriter:
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
         self.client = anthropic.Client(api_key=self.api_key)
         self.perplexity_api_key = os.getenv("PERPLEXITY_API_KEY")
+        # One client, and so one connection pool, for every Perplexity call in the run
+        self.perplexity_client = OpenAI(api_key=self.perplexity_api_key, base_url=PERPLEXITY_BASE_URL, max_retries=1)
+        self.waiter = LinkedInWaiter()
+        self.cache_stats = PromptCacheStats()
+        self.research_cache = ResearchCache()
 
     def load_cookies(self):
         with open(self.cookies_file, 'r') as file:
@@ -37,9 +87,7 @@ class LinkedInArticleWriter:
             },
         ]
 
-        client = OpenAI(api_key=self.perplexity_api_key, base_url="https://api.perplexity.ai")
-
-        response = client.chat.completions.create(
+        response = self.perplexity_client.chat.completions.create(
             model="llama-3-sonar-small-32k-online",
             messages=messages,
         )
@@ -63,9 +111,7 @@ class LinkedInArticleWriter:
             },
         ]
 
-        client = OpenAI(api_key=self.perplexity_api_key, base_url="https://api.perplexity.ai")
-
-        response = client.chat.completions.create(
+        response = self.perplexity_client.chat.completions.create(
             model="llama-3-sonar-small-32k-online",
             messages=messages,
         )
@@ -79,68 +125,66 @@ class LinkedInArticleWriter:
         url_links = re.findall(url_regex, text)
         return url_links
 
-    def summarize_articles(self, articles):
-        summaries = []
-        for article in articles:
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert at efficiently summarizing content into less than 200 words while still maintaining the tone of the original author."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Please provide the author's name and a summary the following article: {article}"
-                    ),
-                },
-            ]
-
-            client = OpenAI(api_key=self.perplexity_api_key, base_url="https://api.perplexity.ai")
+    def summarize_article(self, article):
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You are an expert at efficiently summarizing content into less than 200 words while still maintaining the tone of the original author."
+                ),
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Please provide the author's name and a summary the following article: {article}"
+                ),
+            },
+        ]
 
-            response = client.chat.completions.create(
+        try:
+            response = self.perplexity_client.chat.completions.create(
                 model="llama-3-sonar-large-32k-online",
                 messages=messages,
+                timeout=SUMMARY_TIMEOUT,
             )
-            print(response)
+        except Exception as e:
+            print(f"Error summarizing {article}: {str(e)}")
+            return None
+        print(response)
+
+        return response.choices[0].message.content
 
-            summaries.append(response.choices[0].message.content)
+    def summarize_articles(self, articles):
+        # Research time follows the slowest article rather than the sum of all of them
+        with ThreadPoolExecutor(max_workers=min(SUMMARY_WORKERS, max(1, len(articles)))) as executor:
+            results = list(executor.map(self.summarize_article, articles))
 
+        summaries = [summary for summary in results if summary]
+        if len(summaries) < len(articles):
+            print(f"Summarized {len(summaries)} of {len(articles)} articles; continuing without the rest.")
         return summaries
 
     def generate_article(self, summaries, subject, article_length, influencers_and_posts):
         print("Generating article using Anthropic Claude-3 Opus...")
-        prompt = f"Please write an article of approximately {article_length} words based on the the subject: {subject}, and using the following summaries as inspiration making sure to keep the tone:\n\n{summaries}\n\n"
-        prompt += f"The article should be coherent, and provide insight into a single theme that is most common in the summaries on {subject}. Use appropriate hashtags. Divide the content into subsections with subheadings. There should be an introduction and conclusion with a call to action, but do not use the subheadings Introduction, Conclusion or Call To Action. Do not create a title. The tone should be professional, succinct and authoritative.\n\n"
-        prompt += "To optimize the article for SEO, follow these rules:\n"
-        prompt += "1. Find a primary keyword to target\n"
-        prompt += "2. Assess search intent\n"
-        prompt += "3. Assess your chances of ranking in Google\n"
-        prompt += "4. Research what people want to know\n"
-        prompt += "5. Optimize headings and subheadings\n"
-        prompt += "6. Hook readers with your intro (blog posts only)\n"
-        prompt += "7. Edit your copy for simplicity\n"
-        prompt += "8. Link to relevant resources\n"
-        prompt += "9. Make it easier to consume with images\n"
-        prompt += "10. Optimize your images\n"
-        prompt += "11. Set a compelling title tag and meta description\n"
-        prompt += "12. Set an SEO-friendly URL slug\n"
-        prompt += "13. Add schema markup for rich snippets\n"
-        prompt += "14. Add a table of contents (blog posts only)\n\n"
-        prompt += f"Also, consider the top 50 influencers on social media related to {subject} and their latest posts:\n\n{influencers_and_posts}\n\n"
-        prompt += f"Incorporate insights from these influencers and their posts related to {subject} into the article to provide additional context and relevance.\n\n"
-        prompt += "The article MUST be written with Markdown formatting."
+        # Static guidelines, then the research for this run, then the short per-call request;
+        # retries reuse both cached prefixes and only pay full price for the request itself
+        system = [cached_block(f"{ARTICLE_SYSTEM_PROMPT}\n\n{ARTICLE_GUIDELINES}")]
+        research = f"Article summaries on {subject}:\n\n{summaries}\n\n"
+        research += f"The top 50 influencers on social media related to {subject} and their latest posts:\n\n{influencers_and_posts}"
+        prompt = f"Please write an article of approximately {article_length} words based on the the subject: {subject}, and using the summaries above as inspiration making sure to keep the tone. "
+        prompt += f"Incorporate insights from these influencers and their posts related to {subject} into the article to provide additional context and relevance."
+        messages = [
+            {"role": "user", "content": [cached_block(research), text_block(prompt)]}
+        ]
 
         response = self.client.messages.create(
             model="claude-3-opus-20240229",
             max_tokens=4096,
             temperature=0.7,
-            system="You are an expert content marketer and business development executive that generates thought provoking articles for LinkedIn.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            system=system,
+            messages=messages
         )
+        self.cache_stats.record("article", response)
         print("Article generated successfully.")
 
         article_content = response.content[0].text  # Extract the text content from the ContentBlock object
@@ -148,16 +192,17 @@ class LinkedInArticleWriter:
 
     def generate_title(self, subject, article_content):
         print("Generating title using Anthropic Claude-3 Haiku...")
-        prompt = f"Please generate a concise and thought provoking click-bait title for the following article:\n\n{article_content}. It is based on the subject: {subject}. Use no more than 10 words. Do not include any quotation marks."
+        prompt = f"Please generate a concise and thought provoking click-bait title for the article above. It is based on the subject: {subject}. Use no more than 10 words. Do not include any quotation marks."
         response = self.client.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=100,
             temperature=0.7,
-            system="You are an expert content marketer and business development executive that generates thought eye catching, clickable titles for LinkedIn articles.",
+            system=ARTICLE_META_SYSTEM_PROMPT,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": [cached_block(f"Article:\n\n{article_content}"), text_block(prompt)]}
             ]
         )
+        self.cache_stats.record("title", response)
         print("Title generated successfully.")
 
         title = response.content[0].text  # Extract the text content from the ContentBlock object
@@ -165,16 +210,17 @@ class LinkedInArticleWriter:
 
     def generate_summary(self, article_content):
         print("Generating summary using Anthropic Claude-3 Haiku...")
-        prompt = f"Please generate a professional but catchy summary of no more than 25 words of the following article with appropriate hashtags:\n\n{article_content}"
+        prompt = "Please generate a professional but catchy summary of no more than 25 words of the article above with appropriate hashtags."
         response = self.client.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=100,
             temperature=0.7,
-            system="You are an expert content marketer and business development executive that generates thought-provoking and engaging summaries for LinkedIn articles.",
+            system=ARTICLE_META_SYSTEM_PROMPT,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": [cached_block(f"Article:\n\n{article_content}"), text_block(prompt)]}
             ]
         )
+        self.cache_stats.record("summary", response)
         print("Summary generated successfully.")
 
         summary = response.content[0].text  # Extract the text content from the ContentBlock object
@@ -204,20 +250,17 @@ class LinkedInArticleWriter:
                 page.wait_for_selector('textarea[id="article-editor-headline__textarea"]', timeout=30000)
                 page.fill('textarea[id="article-editor-headline__textarea"]', title)
 
-                # Wait for 3 seconds
-                page.wait_for_timeout(3000)
+                # Wait for the article body editor to be ready rather than a fixed 3 seconds
+                self.waiter.wait_for(page, 'div[contenteditable="true"]', timeout=10000, label="article body editor")
 
                 page.keyboard.type(article_content)
 
-                # Wait for 5 seconds to ensure article can be saved
-                page.wait_for_timeout(5000)
+                # Wait for the editor to report the draft as saved before moving on
+                self.waiter.wait_for(page, ARTICLE_DRAFT_SAVED_SELECTOR, timeout=10000, label="article draft saved")
 
                 # Click the Next button
                 page.click('button[class="article-editor-nav__publish artdeco-button artdeco-button--icon-right artdeco-button--2 artdeco-button--primary ember-view"]')
 
-                # Wait for 5 seconds
-                page.wait_for_timeout(5000)
-
                 # Wait for the summary div to be visible
                 page.wait_for_selector('div[class="ql-editor ql-blank"]', timeout=30000)
                 page.fill('div[class="ql-editor ql-blank"]', summary)
@@ -236,30 +279,46 @@ class LinkedInArticleWriter:
                 print("Article not approved. Discarding...")
 
             browser.close()
+            self.waiter.report()
 
         return approved
 
-    def run(self):
-        self.load_cookies()
-        region = input("Enter the target region or country: ")
-        subject = input("Enter the subject: ")
-        article_length = int(input("Enter the desired article length (in words, 500 is the recommended): "))
-        
-        url_links = []
-        while len(url_links) < 5:
-            print("\nDoing a Perplexity.ai Search for the Top 5 articles and authors...")
+    def find_article_urls(self, region, subject):
+        # Fresh results from earlier runs count towards the target; each search only adds URLs not seen before
+        url_links = self.research_cache.urls(region, subject)
+        if len(url_links) >= RESEARCH_TARGET_URLS:
+            print(f"\nUsing {len(url_links)} cached article URLs for {subject} in {region}.")
+            return url_links[:RESEARCH_TARGET_URLS]
+
+        attempts = 0
+        deadline = time.monotonic() + RESEARCH_TIME_BUDGET
+        while len(url_links) < RESEARCH_TARGET_URLS and attempts < RESEARCH_MAX_ATTEMPTS and time.monotonic() < deadline:
+            attempts += 1
+            print(f"\nDoing a Perplexity.ai Search for the Top 5 articles and authors (attempt {attempts}/{RESEARCH_MAX_ATTEMPTS})...")
             top_articles = self.get_top_articles(region, subject)
             print("\nInfluencers and Articles:")
             print(top_articles)
 
-            # Extract URL links from the response
-            url_links = self.extract_url_links(top_articles)
+            # Extract URL links from the response and add them to those already found
+            url_links = self.research_cache.add(region, subject, self.extract_url_links(top_articles))
             print("\nExtracted URL Links:")
             print(url_links)
 
-            if len(url_links) < 5:
+            if len(url_links) < RESEARCH_TARGET_URLS:
                 print("Less than 5 URLs found. Performing another search...")
 
+        if len(url_links) < RESEARCH_TARGET_URLS:
+            print(f"Search budget used up. Continuing with {len(url_links)} URLs.")
+        return url_links[:RESEARCH_TARGET_URLS]
+
+    def run(self):
+        self.load_cookies()
+        region = input("Enter the target region or country: ")
+        subject = input("Enter the subject: ")
+        article_length = int(input("Enter the desired article length (in words, 500 is the recommended): "))
+        
+        url_links = self.find_article_urls(region, subject)
+
         # Summarize the URL links using Perplexity
         summaries = self.summarize_articles(url_links)
         print("\nArticle Summaries:")
@@ -284,6 +343,8 @@ class LinkedInArticleWriter:
         if not approved:
             print("Max retries reached. Article not published.")
 
+        self.cache_stats.report()
+
 
 # Usage example
 cookies_file = '.li_session'
@@ -1,21 +1,78 @@
 import json
+import argparse
 from playwright.sync_api import sync_playwright
 import anthropic
 from dotenv import load_dotenv
 from openai import OpenAI
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from class_li_waits import LinkedInWaiter
+from class_research_cache import ResearchCache
+from class_prompt_cache import PromptCacheStats, cached_block, text_block
+from class_task_graph import TaskGraph
+from class_li_runconfig import LinkedInRunConfig, value_or_prompt
 import requests
 
 load_dotenv()
 
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+# Summaries run side by side; each request gets its own timeout so one slow source can't hold up the rest
+SUMMARY_WORKERS = 5
+SUMMARY_TIMEOUT = 90
+
+# Article searches stop at the target, after a few attempts or once the time budget is spent, whichever comes first
+RESEARCH_TARGET_URLS = 5
+RESEARCH_MAX_ATTEMPTS = 3
+RESEARCH_TIME_BUDGET = 120
+
+# Concrete signals on the article editor; LinkedIn keeps background requests open, so the network never goes idle
+ARTICLE_DRAFT_SAVED_SELECTOR = ".article-editor-toolbar__draft-status:has-text('Saved'), .article-editor-nav__draft-status:has-text('Saved')"
+ARTICLE_COVER_IMAGE_SELECTOR = ".article-editor-cover-media img, img.article-editor-cover-image__image"
+
+# Static instructions shared by every article; cached together with the system prompt
+ARTICLE_SYSTEM_PROMPT = "You are an expert content marketer and business development executive that generates thought provoking articles for LinkedIn."
+
+ARTICLE_GUIDELINES = (
+    "The article should be coherent, and provide insight into a single theme that is most common in the summaries. Use appropriate hashtags. Divide the content into subsections with subheadings. There should be an introduction and conclusion with a call to action, but do not use the subheadings Introduction, Conclusion or Call To Action. Do not create a title. The tone should be professional, succinct and authoritative.\n\n"
+    "To optimize the article for SEO, follow these rules:\n"
+    "1. Find a primary keyword to target\n"
+    "2. Assess search intent\n"
+    "3. Assess your chances of ranking in Google\n"
+    "4. Research what people want to know\n"
+    "5. Optimize headings and subheadings\n"
+    "6. Hook readers with your intro (blog posts only)\n"
+    "7. Edit your copy for simplicity\n"
+    "8. Link to relevant resources\n"
+    "9. Make it easier to consume with images\n"
+    "10. Optimize your images\n"
+    "11. Set a compelling title tag and meta description\n"
+    "12. Set an SEO-friendly URL slug\n"
+    "13. Add schema markup for rich snippets\n"
+    "14. Add a table of contents (blog posts only)\n\n"
+    "The article MUST be written with Markdown formatting."
+)
+
+# Title and summary share a system prompt so the article block is one cached prefix for both calls
+ARTICLE_META_SYSTEM_PROMPT = "You are an expert content marketer and business development executive that generates eye catching, clickable titles and thought-provoking, engaging summaries for LinkedIn articles."
+
 class LinkedInArticleWriter:
-    def __init__(self, cookies_file):
+    def __init__(self, cookies_file, headless=False, timeout=30000, auto_approve=False):
         self.cookies_file = cookies_file
+        self.headless = headless
+        self.timeout = timeout
+        self.auto_approve = auto_approve
         self.max_retries = 3
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
         self.client = anthropic.Client(api_key=self.api_key)
         self.perplexity_api_key = os.getenv("PERPLEXITY_API_KEY")
+        # One client, and so one connection pool, for every Perplexity call in the run
+        self.perplexity_client = OpenAI(api_key=self.perplexity_api_key, base_url=PERPLEXITY_BASE_URL, max_retries=1)
+        self.waiter = LinkedInWaiter()
+        self.cache_stats = PromptCacheStats()
+        self.research_cache = ResearchCache()
 
     def load_cookies(self):
         with open(self.cookies_file, 'r') as file:
@@ -38,9 +95,7 @@ class LinkedInArticleWriter:
             },
         ]
 
-        client = OpenAI(api_key=self.perplexity_api_key, base_url="https://api.perplexity.ai")
-
-        response = client.chat.completions.create(
+        response = self.perplexity_client.chat.completions.create(
             model="llama-3-sonar-small-32k-online",
             messages=messages,
         )
@@ -64,9 +119,7 @@ class LinkedInArticleWriter:
             },
         ]
 
-        client = OpenAI(api_key=self.perplexity_api_key, base_url="https://api.perplexity.ai")
-
-        response = client.chat.completions.create(
+        response = self.perplexity_client.chat.completions.create(
             model="llama-3-sonar-small-32k-online",
             messages=messages,
         )
@@ -80,58 +133,57 @@ class LinkedInArticleWriter:
         url_links = re.findall(url_regex, text)
         return url_links
 
-    def summarize_articles(self, articles):
-        summaries = []
-        for article in articles:
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert at efficiently summarizing content into less than 200 words while still maintaining the tone of the original author."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Please provide the author's name and a summary the following article: {article}"
-                    ),
-                },
-            ]
-
-            client = OpenAI(api_key=self.perplexity_api_key, base_url="https://api.perplexity.ai")
+    def summarize_article(self, article):
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You are an expert at efficiently summarizing content into less than 200 words while still maintaining the tone of the original author."
+                ),
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Please provide the author's name and a summary the following article: {article}"
+                ),
+            },
+        ]
 
-            response = client.chat.completions.create(
+        try:
+            response = self.perplexity_client.chat.completions.create(
                 model="llama-3-sonar-large-32k-online",
                 messages=messages,
+                timeout=SUMMARY_TIMEOUT,
             )
-            print(response)
+        except Exception as e:
+            print(f"Error summarizing {article}: {str(e)}")
+            return None
+        print(response)
 
-            summaries.append(response.choices[0].message.content)
+        return response.choices[0].message.content
+
+    def summarize_articles(self, articles):
+        # Research time follows the slowest article rather than the sum of all of them
+        with ThreadPoolExecutor(max_workers=min(SUMMARY_WORKERS, max(1, len(articles)))) as executor:
+            results = list(executor.map(self.summarize_article, articles))
 
+        summaries = [summary for summary in results if summary]
+        if len(summaries) < len(articles):
+            print(f"Summarized {len(summaries)} of {len(articles)} articles; continuing without the rest.")
         return summaries
 
     def generate_article(self, summaries, subject, article_length, influencers_and_posts):
         print("Generating article using Anthropic Claude-3 Opus...")
-        prompt = f"Please write an article of approximately {article_length} words based on the the subject: {subject}, and using the following summaries as inspiration making sure to keep the tone:\n\n{summaries}\n\n"
-        prompt += f"The article should be coherent, and provide insight into a single theme that is most common in the summaries on {subject}. Use appropriate hashtags. Divide the content into subsections with subheadings. There should be an introduction and conclusion with a call to action, but do not use the subheadings Introduction, Conclusion or Call To Action. Do not create a title. The tone should be professional, succinct and authoritative.\n\n"
-        prompt += "To optimize the article for SEO, follow these rules:\n"
-        prompt += "1. Find a primary keyword to target\n"
-        prompt += "2. Assess search intent\n"
-        prompt += "3. Assess your chances of ranking in Google\n"
-        prompt += "4. Research what people want to know\n"
-        prompt += "5. Optimize headings and subheadings\n"
-        prompt += "6. Hook readers with your intro (blog posts only)\n"
-        prompt += "7. Edit your copy for simplicity\n"
-        prompt += "8. Link to relevant resources\n"
-        prompt += "9. Make it easier to consume with images\n"
-        prompt += "10. Optimize your images\n"
-        prompt += "11. Set a compelling title tag and meta description\n"
-        prompt += "12. Set an SEO-friendly URL slug\n"
-        prompt += "13. Add schema markup for rich snippets\n"
-        prompt += "14. Add a table of contents (blog posts only)\n\n"
-        prompt += f"Also, consider the top 50 influencers on social media related to {subject} and their latest posts:\n\n{influencers_and_posts}\n\n"
-        prompt += f"Incorporate insights from these influencers and their posts related to {subject} into the article to provide additional context and relevance.\n\n"
-        prompt += "The article MUST be written with Markdown formatting."
+        # Static guidelines, then the research for this run, then the short per-call request;
+        # retries reuse both cached prefixes and only pay full price for the request itself
+        system = [cached_block(f"{ARTICLE_SYSTEM_PROMPT}\n\n{ARTICLE_GUIDELINES}")]
+        research = f"Article summaries on {subject}:\n\n{summaries}\n\n"
+        research += f"The top 50 influencers on social media related to {subject} and their latest posts:\n\n{influencers_and_posts}"
+        prompt = f"Please write an article of approximately {article_length} words based on the the subject: {subject}, and using the summaries above as inspiration making sure to keep the tone. "
+        prompt += f"Incorporate insights from these influencers and their posts related to {subject} into the article to provide additional context and relevance."
+        messages = [
+            {"role": "user", "content": [cached_block(research), text_block(prompt)]}
+        ]
 
         retries = 0
         max_retries = 3
@@ -141,11 +193,10 @@ class LinkedInArticleWriter:
                     model="claude-3-opus-20240229",
                     max_tokens=4096,
                     temperature=0.7,
-                    system="You are an expert content marketer and business development executive that generates thought provoking articles for LinkedIn.",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
+                    system=system,
+                    messages=messages
                 )
+                self.cache_stats.record("article", response)
                 print("Article generated successfully.")
                 article_content = response.content[0].text  # Extract the text content from the ContentBlock object
                 return article_content
@@ -158,16 +209,17 @@ class LinkedInArticleWriter:
 
     def generate_title(self, subject, article_content):
         print("Generating title using Anthropic Claude-3 Haiku...")
-        prompt = f"Please generate a concise and thought provoking click-bait title for the following article:\n\n{article_content}. It is based on the subject: {subject}. Use no more than 10 words. Do not include any quotation marks."
+        prompt = f"Please generate a concise and thought provoking click-bait title for the article above. It is based on the subject: {subject}. Use no more than 10 words. Do not include any quotation marks."
         response = self.client.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=100,
             temperature=0.7,
-            system="You are an expert content marketer and business development executive that generates thought eye catching, clickable titles for LinkedIn articles.",
+            system=ARTICLE_META_SYSTEM_PROMPT,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": [cached_block(f"Article:\n\n{article_content}"), text_block(prompt)]}
             ]
         )
+        self.cache_stats.record("title", response)
         print("Title generated successfully.")
 
         title = response.content[0].text  # Extract the text content from the ContentBlock object
@@ -175,27 +227,28 @@ class LinkedInArticleWriter:
 
     def generate_summary(self, article_content):
         print("Generating summary using Anthropic Claude-3 Haiku...")
-        prompt = f"Please generate a professional but catchy summary of no more than 25 words of the following article with appropriate hashtags:\n\n{article_content}"
+        prompt = "Please generate a professional but catchy summary of no more than 25 words of the article above with appropriate hashtags."
         response = self.client.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=100,
             temperature=0.7,
-            system="You are an expert content marketer and business development executive that generates thought-provoking and engaging summaries for LinkedIn articles.",
+            system=ARTICLE_META_SYSTEM_PROMPT,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": [cached_block(f"Article:\n\n{article_content}"), text_block(prompt)]}
             ]
         )
+        self.cache_stats.record("summary", response)
         print("Summary generated successfully.")
 
         summary = response.content[0].text  # Extract the text content from the ContentBlock object
         return summary
 
-    def generate_hero_image(self, title):
+    def generate_hero_image(self, subject):
         print("Generating hero image using DALL-E 3...")
         
         client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-        prompt = f"Create a professional header image for a LinkedIn article based on this subject - do not use any words, numbers or letters: {title}"
+        prompt = f"Create a professional header image for a LinkedIn article based on this subject - do not use any words, numbers or letters: {subject}"
 
         response = client.images.generate(
             model="dall-e-3",
@@ -218,19 +271,20 @@ class LinkedInArticleWriter:
 
         return "hero_image.png"
 
-    def write_article(self, article_content, title, summary):
-        # Generate the hero image based on the title before opening the browser window
-        hero_image_path = self.generate_hero_image(title)
+    def write_article(self, article_content, title, summary, hero_image_path=None):
+        # run() generates the hero image alongside the research; direct callers still get one from the title
+        if hero_image_path is None:
+            hero_image_path = self.generate_hero_image(title)
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
+            browser = p.chromium.launch(headless=self.headless)
             page = browser.new_page()
 
             # Set cookies
             for cookie in self.cookies:
                 page.context.add_cookies([cookie])
 
-            page.goto('https://www.linkedin.com/article/new/')
+            page.goto('https://www.linkedin.com/article/new/', timeout=self.timeout)
 
             # Preview the article
             print("\nPreview of the article:")
@@ -238,27 +292,31 @@ class LinkedInArticleWriter:
             print("Content:", article_content)
 
             # Prompt for approval
-            approved = input("Do you approve the article? You will be given one more opportunity later to approve or disapprove (yes/no): ").lower() == 'yes'
+            if self.auto_approve:
+                approved = True
+                print("Auto-approving article.")
+            else:
+                approved = input("Do you approve the article? You will be given one more opportunity later to approve or disapprove (yes/no): ").lower() == 'yes'
 
             if approved:
                 # Wait for the title textarea to be visible
-                page.wait_for_selector('textarea[id="article-editor-headline__textarea"]', timeout=30000)
+                page.wait_for_selector('textarea[id="article-editor-headline__textarea"]', timeout=self.timeout)
                 page.fill('textarea[id="article-editor-headline__textarea"]', title)
 
-                # Wait for 3 seconds
-                page.wait_for_timeout(3000)
+                # Wait for the article body editor to be ready rather than a fixed 3 seconds
+                self.waiter.wait_for(page, 'div[contenteditable="true"]', timeout=10000, label="article body editor")
 
                 page.keyboard.type(article_content)
 
-                # Wait for 5 seconds to ensure article can be saved
-                page.wait_for_timeout(5000)
+                # Wait for the editor to report the draft as saved before moving on
+                self.waiter.wait_for(page, ARTICLE_DRAFT_SAVED_SELECTOR, timeout=10000, label="article draft saved")
 
                 # Upload the hero image
-                page.wait_for_selector('input[id="article-editor-cover-image__file-input"]', timeout=30000)
+                page.wait_for_selector('input[id="article-editor-cover-image__file-input"]', timeout=self.timeout)
                 page.set_input_files('input[id="article-editor-cover-image__file-input"]', hero_image_path)
 
-                # Wait for 5 seconds to ensure image is uploaded
-                page.wait_for_timeout(5000)
+                # Wait for the uploaded image to show up as the cover preview
+                self.waiter.wait_for(page, ARTICLE_COVER_IMAGE_SELECTOR, timeout=15000, label="hero image uploaded")
 
                 # Retry clicking the "Next" button up to 10 times
                 max_retries = 10
@@ -266,10 +324,9 @@ class LinkedInArticleWriter:
                 for attempt in range(1, max_retries + 1):
                     print(f"Attempt {attempt}: Clicking the 'Next' button...")
                     page.click('button[class="article-editor-nav__publish artdeco-button artdeco-button--icon-right artdeco-button--2 artdeco-button--primary ember-view"]')
-                    page.wait_for_timeout(retry_delay)
 
-                    # Check if the specified HTML element is present
-                    if page.query_selector('h2[id="share-to-linkedin-modal__header"]'):
+                    # Check if the specified HTML element is present, returning as soon as it appears
+                    if self.waiter.wait_for(page, 'h2[id="share-to-linkedin-modal__header"]', timeout=retry_delay, label="share modal"):
                         print("HTML element detected. Proceeding to the next step.")
                         break
                     else:
@@ -280,12 +337,16 @@ class LinkedInArticleWriter:
                         return False
 
                 # Wait for the summary div to be visible
-                page.wait_for_selector('div[class="ql-editor ql-blank"]', timeout=30000)
+                page.wait_for_selector('div[class="ql-editor ql-blank"]', timeout=self.timeout)
                 page.fill('div[class="ql-editor ql-blank"]', summary)
 
                 # Prompt for approval one more time
                 print("\nInjecting article into LinkedIn and pushing to publish...\n")
-                final_approval = input("Do you want to publish the article? This is your final chance to approve or disapprove (yes/no): ").lower() == 'yes'
+                if self.auto_approve:
+                    final_approval = True
+                    print("Auto-approving publication.")
+                else:
+                    final_approval = input("Do you want to publish the article? This is your final chance to approve or disapprove (yes/no): ").lower() == 'yes'
 
                 if final_approval:
                     # Click the Publish button
@@ -297,47 +358,76 @@ class LinkedInArticleWriter:
                 print("Article not approved. Discarding...")
 
             browser.close()
+            self.waiter.report()
 
         return approved
 
-    def run(self):
-        self.load_cookies()
-        region = input("Enter the target region or country: ")
-        subject = input("Enter the subject: ")
-        article_length = int(input("Enter the desired article length (in words, 500 is the recommended): "))
-        
-        url_links = []
-        while len(url_links) < 5:
-            print("\nDoing a Perplexity.ai Search for the Top 5 articles and authors...")
+    def find_article_urls(self, region, subject):
+        # Fresh results from earlier runs count towards the target; each search only adds URLs not seen before
+        url_links = self.research_cache.urls(region, subject)
+        if len(url_links) >= RESEARCH_TARGET_URLS:
+            print(f"\nUsing {len(url_links)} cached article URLs for {subject} in {region}.")
+            return url_links[:RESEARCH_TARGET_URLS]
+
+        attempts = 0
+        deadline = time.monotonic() + RESEARCH_TIME_BUDGET
+        while len(url_links) < RESEARCH_TARGET_URLS and attempts < RESEARCH_MAX_ATTEMPTS and time.monotonic() < deadline:
+            attempts += 1
+            print(f"\nDoing a Perplexity.ai Search for the Top 5 articles and authors (attempt {attempts}/{RESEARCH_MAX_ATTEMPTS})...")
             top_articles = self.get_top_articles(region, subject)
             print("\nInfluencers and Articles:")
             print(top_articles)
 
-            # Extract URL links from the response
-            url_links = self.extract_url_links(top_articles)
+            # Extract URL links from the response and add them to those already found
+            url_links = self.research_cache.add(region, subject, self.extract_url_links(top_articles))
             print("\nExtracted URL Links:")
             print(url_links)
 
-            if len(url_links) < 5:
+            if len(url_links) < RESEARCH_TARGET_URLS:
                 print("Less than 5 URLs found. Performing another search...")
 
+        if len(url_links) < RESEARCH_TARGET_URLS:
+            print(f"Search budget used up. Continuing with {len(url_links)} URLs.")
+        return url_links[:RESEARCH_TARGET_URLS]
+
+    def summarize_article_urls(self, url_links):
         # Summarize the URL links using Perplexity
         summaries = self.summarize_articles(url_links)
         print("\nArticle Summaries:")
         print(summaries)
+        return summaries
 
+    def find_influencers_and_posts(self, region, subject):
         print("\nDoing a Perplexity.ai Search for the Top influencers and their latest posts...")
         influencers_and_posts = self.get_influencers_and_posts(region, subject)
         print("\nInfluencers and Their Latest Posts:")
         print(influencers_and_posts)
+        return influencers_and_posts
+
+    def run(self, region=None, subject=None, article_length=None):
+        self.load_cookies()
+        region = value_or_prompt(region, "Enter the target region or country: ")
+        subject = value_or_prompt(subject, "Enter the subject: ")
+        article_length = int(value_or_prompt(article_length, "Enter the desired article length (in words, 500 is the recommended): "))
+        
+        # The influencer search and the hero image don't depend on the articles, so all three start at once
+        research = TaskGraph("Research")
+        research.add("url_links", lambda: self.find_article_urls(region, subject))
+        research.add("summaries", lambda url_links: self.summarize_article_urls(url_links), depends_on=["url_links"])
+        research.add("influencers_and_posts", lambda: self.find_influencers_and_posts(region, subject))
+        research.add("hero_image_path", lambda: self.generate_hero_image(subject))
+        research_results = research.run()
 
         retries = 0
         while retries < self.max_retries:
-            article_content = self.generate_article(summaries, subject, article_length, influencers_and_posts)
-            title = self.generate_title(subject, article_content)
-            summary = self.generate_summary(article_content)
-
-            approved = self.write_article(article_content, title, summary)
+            # Title and summary only need the body, so they are generated side by side
+            drafting = TaskGraph("Drafting")
+            drafting.add("article_content", lambda: self.generate_article(research_results["summaries"], subject, article_length, research_results["influencers_and_posts"]))
+            drafting.add("title", lambda article_content: self.generate_title(subject, article_content), depends_on=["article_content"])
+            drafting.add("summary", lambda article_content: self.generate_summary(article_content), depends_on=["article_content"])
+            draft = drafting.run()
+
+            approved = self.write_article(draft["article_content"], draft["title"], draft["summary"], research_results["hero_image_path"])
             if approved:
                 break
             retries += 1
@@ -345,9 +435,22 @@ class LinkedInArticleWriter:
         if not approved:
             print("Max retries reached. Article not published.")
 
+        self.cache_stats.report()
 
-# Usage example
-cookies_file = '.li_session'
 
-article_writer = LinkedInArticleWriter(cookies_file)
-article_writer.run()
+def main():
+    parser = argparse.ArgumentParser(description="Research, write and publish a LinkedIn article.")
+    parser.add_argument("--region", help="Target region or country (asked when omitted)")
+    parser.add_argument("--subject", help="Article subject (asked when omitted)")
+    parser.add_argument("--length", type=int, help="Article length in words, 500 is recommended (asked when omitted)")
+    parser.add_argument("--yes", dest="auto_approve", action="store_true", help="Approve and publish the article without asking")
+    LinkedInRunConfig.add_arguments(parser, concurrency=None, block_resources=None)
+    args = parser.parse_args()
+    config = LinkedInRunConfig.from_args(args)
+
+    article_writer = LinkedInArticleWriter(config.session_file, headless=config.headless, timeout=config.timeout, auto_approve=args.auto_approve)
+    article_writer.run(region=args.region, subject=args.subject, article_length=args.length)
+
+# Usage example
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+from contextlib import contextmanager
+from queue import Queue
+from playwright.sync_api import sync_playwright
+from class_li_resourceblocker import LinkedInResourceBlocker
+
+class LinkedInBrowserPool:
+    def __init__(self, cookie_file=".li_session", pool_size=2, headless=False, max_uses_per_page=50, block_resources=True):
+        self.cookie_file = cookie_file
+        self.pool_size = max(1, pool_size)
+        self.headless = headless
+        # Recycle a page after this many navigations so long runs don't keep growing in memory
+        self.max_uses_per_page = max_uses_per_page
+        # Read-only scraping never needs images, media, fonts or tracking beacons
+        self.resource_blocker = LinkedInResourceBlocker() if block_resources else None
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.pages = Queue()
+        self.page_uses = {}
+
+    def load_cookies_from_file(self):
+        print(f"Loading cookies from file: {self.cookie_file}")
+        with open(self.cookie_file, 'r') as file:
+            return json.load(file)
+
+    def start(self):
+        if self.browser is not None:
+            return self
+
+        print(f"Launching shared Chromium browser with {self.pool_size} page(s)...")
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=self.headless)
+        self.context = self.browser.new_context()
+        if self.resource_blocker is not None:
+            self.resource_blocker.install(self.context)
+
+        # Load cookies once for the whole run
+        self.context.add_cookies(self.load_cookies_from_file())
+
+        for _ in range(self.pool_size):
+            self.pages.put(self.new_page())
+        return self
+
+    def new_page(self):
+        page = self.context.new_page()
+        self.page_uses[id(page)] = 0
+        return page
+
+    @contextmanager
+    def page(self):
+        if self.browser is None:
+            self.start()
+
+        page = self.pages.get()
+        try:
+            yield page
+        finally:
+            self.release(page)
+
+    def release(self, page):
+        uses = self.page_uses.pop(id(page), 0) + 1
+        if page.is_closed() or uses >= self.max_uses_per_page:
+            # Replace worn out or crashed pages with a fresh one from the same context
+            if not page.is_closed():
+                page.close()
+            page = self.new_page()
+            uses = 0
+        self.page_uses[id(page)] = uses
+        self.pages.put(page)
+
+    def close(self):
+        if self.browser is None:
+            return
+
+        print("Closing shared Chromium browser...")
+        if self.resource_blocker is not None:
+            self.resource_blocker.report()
+        try:
+            self.context.close()
+            self.browser.close()
+        finally:
+            self.playwright.stop()
+            self.browser = None
+            self.context = None
+            self.playwright = None
+            self.pages = Queue()
+            self.page_uses = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -3,10 +3,7 @@ from playwright.sync_api import sync_playwright
 import os
 import time
 import re
-import pandas as pd
-import docx
-from PyPDF2 import PdfReader
-import csv
+from class_li_urlextractor import LinkedInUrlExtractor
 
 class LinkedInConnector:
     def __init__(self, input_file, session_file):
@@ -14,67 +11,9 @@ class LinkedInConnector:
         self.session_file = session_file
 
     def extract_linkedin_urls(self):
-        file_extension = os.path.splitext(self.input_file)[1].lower()
-        linkedin_urls = []
-
-        if file_extension == ".json":
-            with open(self.input_file, "r") as file:
-                individuals_data = json.load(file)
-
-            for person_data in individuals_data:
-                if "person" in person_data:
-                    linkedin_url = None
-                    for key, value in person_data["person"].items():
-                        if isinstance(value, str) and value.startswith("https://www.linkedin.com/in/"):
-                            linkedin_url = value
-                            break
-
-                    if linkedin_url:
-                        linkedin_urls.append(linkedin_url)
-                    else:
-                        print(f"LinkedIn profile URL not found for person with ID: {person_data['person']['id']}")
-                else:
-                    print(f"Person data not found for entry: {person_data}")
-
-        elif file_extension in [".xls", ".xlsx"]:
-            df = pd.read_excel(self.input_file)
-            for _, row in df.iterrows():
-                for value in row.values:
-                    if isinstance(value, str) and value.startswith("https://www.linkedin.com/in/"):
-                        linkedin_urls.append(value)
-
-        elif file_extension == ".csv":
-            with open(self.input_file, "r") as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    for value in row:
-                        if value.startswith("https://www.linkedin.com/in/"):
-                            linkedin_urls.append(value)
-
-        elif file_extension == ".txt":
-            with open(self.input_file, "r") as file:
-                for line in file:
-                    if line.startswith("https://www.linkedin.com/in/"):
-                        linkedin_urls.append(line.strip())
-
-        elif file_extension == ".docx":
-            doc = docx.Document(self.input_file)
-            for paragraph in doc.paragraphs:
-                if paragraph.text.startswith("https://www.linkedin.com/in/"):
-                    linkedin_urls.append(paragraph.text.strip())
-
-        elif file_extension == ".pdf":
-            with open(self.input_file, "rb") as file:
-                pdf_reader = PdfReader(file)
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    urls = re.findall(r"https://www.linkedin.com/in/\S+", text)
-                    linkedin_urls.extend(urls)
-
-        else:
-            print(f"Unsupported file format: {file_extension}")
-
-        return linkedin_urls
+        # Lazily yields normalized, deduplicated profile URLs from any supported input format
+        return LinkedInUrlExtractor(self.input_file).iter_urls()
+
     def connect_to_profiles(self):
         linkedin_urls = self.extract_linkedin_urls()
 
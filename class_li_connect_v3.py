@@ -1,86 +1,42 @@
 import json
+import argparse
 from playwright.sync_api import sync_playwright
 import os
-import time
 import re
-import pandas as pd
-import docx
-from PyPDF2 import PdfReader
-import csv
+from class_li_urlextractor import LinkedInUrlExtractor
+from class_li_dedupindex import LinkedInDedupIndex
+from class_li_waits import LinkedInWaiter
+from class_li_resourceblocker import LinkedInResourceBlocker
+from class_li_runconfig import LinkedInRunConfig, value_or_prompt
 import anthropic
 from dotenv import load_dotenv
 
 load_dotenv()
 
+FIRST_CONNECT_BUTTON = 'button.pvs-profile-actions__action[aria-label*="Invite"][aria-label*="to connect"]'
+SECOND_CONNECT_BUTTON = 'div.artdeco-dropdown__item[aria-label*="Invite"][aria-label*="to connect"]'
+INVITE_MODAL_BUTTONS = 'button[aria-label="Send without a note"], button[aria-label="Add a note"]'
+
 class LinkedInConnector:
-    def __init__(self, input_file, session_file):
+    def __init__(self, input_file, session_file, block_resources=True, headless=False, timeout=10000, auto_confirm=None, add_note=None, auto_send_note=False):
         self.input_file = input_file
         self.session_file = session_file
+        self.headless = headless
+        self.timeout = timeout
+        # None means ask at the start of the run, as the interactive flow always did
+        self.auto_confirm = auto_confirm
+        self.auto_add_note_enabled = add_note
+        self.auto_send_note = auto_send_note
+        # Profile pages are only read for buttons and text, so skip images, media, fonts and trackers
+        self.resource_blocker = LinkedInResourceBlocker() if block_resources else None
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
         self.client = anthropic.Client(api_key=self.anthropic_api_key)
+        self.index = LinkedInDedupIndex()
+        self.waiter = LinkedInWaiter()
 
     def extract_linkedin_urls(self):
-        file_extension = os.path.splitext(self.input_file)[1].lower()
-        linkedin_urls = []
-
-        if file_extension == ".json":
-            with open(self.input_file, "r") as file:
-                individuals_data = json.load(file)
-
-            for person_data in individuals_data:
-                if "person" in person_data:
-                    linkedin_url = None
-                    for key, value in person_data["person"].items():
-                        if isinstance(value, str) and value.startswith("https://www.linkedin.com/in/"):
-                            linkedin_url = value
-                            break
-
-                    if linkedin_url:
-                        linkedin_urls.append(linkedin_url)
-                    else:
-                        print(f"LinkedIn profile URL not found for person with ID: {person_data['person']['id']}")
-                else:
-                    print(f"Person data not found for entry: {person_data}")
-
-        elif file_extension in [".xls", ".xlsx"]:
-            df = pd.read_excel(self.input_file)
-            for _, row in df.iterrows():
-                for value in row.values:
-                    if isinstance(value, str) and value.startswith("https://www.linkedin.com/in/"):
-                        linkedin_urls.append(value)
-
-        elif file_extension == ".csv":
-            with open(self.input_file, "r") as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    for value in row:
-                        if value.startswith("https://www.linkedin.com/in/"):
-                            linkedin_urls.append(value)
-
-        elif file_extension == ".txt":
-            with open(self.input_file, "r") as file:
-                for line in file:
-                    if line.startswith("https://www.linkedin.com/in/"):
-                        linkedin_urls.append(line.strip())
-
-        elif file_extension == ".docx":
-            doc = docx.Document(self.input_file)
-            for paragraph in doc.paragraphs:
-                if paragraph.text.startswith("https://www.linkedin.com/in/"):
-                    linkedin_urls.append(paragraph.text.strip())
-
-        elif file_extension == ".pdf":
-            with open(self.input_file, "rb") as file:
-                pdf_reader = PdfReader(file)
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    urls = re.findall(r"https://www.linkedin.com/in/\S+", text)
-                    linkedin_urls.extend(urls)
-
-        else:
-            print(f"Unsupported file format: {file_extension}")
-
-        return linkedin_urls
+        # Lazily yields normalized, deduplicated profile URLs from any supported input format
+        return LinkedInUrlExtractor(self.input_file).iter_urls()
     
     def generate_response(self, post_content):
         print("Generating response using Anthropic Claude 3 Haiku...")
@@ -100,13 +56,13 @@ class LinkedInConnector:
         return response_output
     
     def auto_add_note(self, page, profile_url):
-        time.sleep(1.5)  # Wait for 1500ms for elements to load
-        add_note_button = page.query_selector('button[aria-label="Add a note"]')
+        # Wait for the invitation modal instead of sleeping
+        add_note_button = self.waiter.wait_for(page, 'button[aria-label="Add a note"]', timeout=5000, label="add note button")
         if add_note_button:
             print("Add a note button found")
             add_note_button.click()
             print("Clicked on the add a note button")
-            time.sleep(1.5)  # Wait for 1500ms before filling the text box
+            self.waiter.wait_for(page, 'textarea[name="message"]', timeout=5000, label="note text box")
 
             # Scrape the entire profile element
             profile_element = page.query_selector('main.scaffold-layout__main')
@@ -126,12 +82,17 @@ class LinkedInConnector:
 
                     # Ask the user if they wish to send the invite with the note
                     for attempt in range(3):
-                        confirmation = input(f"Send connection request with the above note to {profile_url}? (y/n): ")
+                        if self.auto_send_note:
+                            confirmation = 'y'
+                            print("Auto-approving note.")
+                        else:
+                            confirmation = input(f"Send connection request with the above note to {profile_url}? (y/n): ")
                         if confirmation.lower() == 'y':
                             send_button = page.query_selector('button[aria-label="Send invitation"]')
                             if send_button:
                                 send_button.click()
                                 print(f"Connection request with note sent to {profile_url}")
+                                self.index.mark_profile(profile_url, "connected")
                             break
                         else:
                             if attempt < 2:
@@ -156,8 +117,10 @@ class LinkedInConnector:
         linkedin_urls = self.extract_linkedin_urls()
 
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
+            browser = p.chromium.launch(headless=self.headless)
             context = browser.new_context()
+            if self.resource_blocker is not None:
+                self.resource_blocker.install(context)
 
             # Load cookies from the session file
             if os.path.exists(self.session_file):
@@ -170,13 +133,14 @@ class LinkedInConnector:
 
             page = context.new_page()
 
-            # Prompt the user for auto-confirmation
-            auto_confirm_input = input("Do you want to auto-confirm connection requests? This will skip adding a note (y/n): ")
-            self.auto_confirm = auto_confirm_input.lower() == 'y'
+            # Prompt the user for auto-confirmation unless it was given on the command line
+            if self.auto_confirm is None:
+                auto_confirm_input = input("Do you want to auto-confirm connection requests? This will skip adding a note (y/n): ")
+                self.auto_confirm = auto_confirm_input.lower() == 'y'
 
             if self.auto_confirm:
                 print("Confirm: Auto-confirming connection requests, skipping adding a note.")
-            else:
+            elif self.auto_add_note_enabled is None:
                 auto_add_note_input = input("Do you want to add a note to the connection request? (y/n): ")
                 self.auto_add_note_enabled = auto_add_note_input.lower() == 'y'
 
@@ -186,9 +150,14 @@ class LinkedInConnector:
                     print(f"Invalid LinkedIn URL: {profile_url}")
                     continue
 
+                # Never send a second request to someone we already connected with in an earlier run
+                if self.index.profile_done(profile_url, "connected"):
+                    print(f"Connection request already sent to {profile_url}. Skipping.")
+                    continue
+
                 print(f"Navigating to profile: {profile_url}")
                 try:
-                    page.goto(profile_url, timeout=10000)
+                    page.goto(profile_url, timeout=self.timeout)
                     print(f"Successfully navigated to profile: {profile_url}")
                 except Exception as e:
                     print(f"Error navigating to profile: {profile_url}")
@@ -197,23 +166,22 @@ class LinkedInConnector:
 
                 # Wait for the profile actions section to be loaded
                 try:
-                    page.wait_for_selector('section.artdeco-card', timeout=10000)
+                    page.wait_for_selector('section.artdeco-card', timeout=self.timeout)
                     print("Profile actions section loaded successfully")
                 except Exception as e:
                     print(f"Error waiting for profile actions section to load: {profile_url}")
                     print(f"Error message: {str(e)}")
                     continue
 
-                time.sleep(3)
-                # Find the connect button using the first selector
-                connect_button = page.query_selector('button.pvs-profile-actions__action[aria-label*="Invite"][aria-label*="to connect"]')
-                time.sleep(3)
+                # Wait until either connect button is in the DOM, then find the connect button using the first selector
+                self.waiter.wait_for(page, f"{FIRST_CONNECT_BUTTON}, {SECOND_CONNECT_BUTTON}", state="attached", timeout=5000, label="connect button")
+                connect_button = page.query_selector(FIRST_CONNECT_BUTTON)
 
                 if connect_button:
                     print("Connect button found")
                     connect_button.click()
                     print("Clicked on the connect button")
-                    time.sleep(3)  # Wait for 3 seconds before attempting to press the send button
+                    self.waiter.wait_for(page, INVITE_MODAL_BUTTONS, timeout=5000, label="invitation modal")
 
                     if self.auto_confirm:
                         send_without_note_button = page.query_selector('button.artdeco-button--primary[aria-label="Send without a note"]')
@@ -221,6 +189,7 @@ class LinkedInConnector:
                             print("Send without note button found")
                             send_without_note_button.click()
                             print(f"Connection request sent to {profile_url}")
+                            self.index.mark_profile(profile_url, "connected")
                     else:
                         if self.auto_add_note_enabled:
                             self.auto_add_note(page, profile_url)
@@ -232,18 +201,18 @@ class LinkedInConnector:
                                     print("Send without note button found")
                                     send_without_note_button.click()
                                     print(f"Connection request sent to {profile_url}")
+                                    self.index.mark_profile(profile_url, "connected")
                             else:
                                 self.auto_add_note(page, profile_url)
                 else:
                     print(f"First connect button not found for profile: {profile_url}")
                     # Try finding the second connect button
-                    second_connect_button = page.query_selector('div.artdeco-dropdown__item[aria-label*="Invite"][aria-label*="to connect"]')
+                    second_connect_button = page.query_selector(SECOND_CONNECT_BUTTON)
                     if second_connect_button:
                         print("Second connect button found")
-                        time.sleep(3)
                         page.evaluate('(element) => element.click()', second_connect_button)
                         print("Clicked on the second connect button using page.evaluate()")
-                        time.sleep(3)  # Wait for 3 seconds before attempting to press the send button
+                        self.waiter.wait_for(page, INVITE_MODAL_BUTTONS, timeout=5000, label="invitation modal")
 
                         if self.auto_confirm:
                             send_without_note_button = page.query_selector('button.artdeco-button--primary[aria-label="Send without a note"]')
@@ -251,6 +220,7 @@ class LinkedInConnector:
                                 print("Send without note button found")
                                 page.evaluate('(element) => element.click()', send_without_note_button)
                                 print(f"Connection request sent to {profile_url}")
+                                self.index.mark_profile(profile_url, "connected")
                         else:
                             if self.auto_add_note_enabled:
                                 self.auto_add_note(page, profile_url)
@@ -262,25 +232,47 @@ class LinkedInConnector:
                                         print("Send without note button found")
                                         page.evaluate('(element) => element.click()', send_without_note_button)
                                         print(f"Connection request sent to {profile_url}")
+                                        self.index.mark_profile(profile_url, "connected")
                                 else:
                                     self.auto_add_note(page, profile_url)
                     else:
                         print(f"Second connect button not found for profile: {profile_url}")
 
-                # Wait for a short delay before proceeding to the next profile
-                time.sleep(2)
+                # Let any open invitation modal close before proceeding to the next profile
+                self.waiter.wait_for(page, 'div[role="dialog"]', state="hidden", timeout=5000, label="invitation modal closed")
 
             browser.close()
+            self.waiter.report()
+            if self.resource_blocker is not None:
+                self.resource_blocker.report()
 
     def is_valid_linkedin_url(self, url):
         pattern = r'^https://www\.linkedin\.com/in/[\w-]+'
         return re.match(pattern, url) is not None
 
-# Usage example
-input_file = input("Enter the full path to the file containing LinkedIn profiles (JSON, XLS, XLSX, CSV, TXT, DOCX, PDF): ")
-session_file = '.li_session'
-connector = LinkedInConnector(input_file, session_file)
-connector.connect_to_profiles()
-
-
+def main():
+    parser = argparse.ArgumentParser(description="Send LinkedIn connection requests to the profiles found in a file.")
+    parser.add_argument("input_file", nargs="?", help="File with LinkedIn profile URLs (JSON, JSONL, XLS, XLSX, CSV, TXT, DOCX, PDF)")
+    parser.add_argument("--auto-confirm", action=argparse.BooleanOptionalAction, help="Send every request without a note or confirmation (asked when omitted)")
+    parser.add_argument("--add-note", action=argparse.BooleanOptionalAction, help="Add a generated note to each request (asked when omitted)")
+    parser.add_argument("--auto-send-note", action="store_true", help="Send generated notes without asking for approval")
+    LinkedInRunConfig.add_arguments(parser, concurrency=None, timeout=10000)
+    args = parser.parse_args()
+    config = LinkedInRunConfig.from_args(args)
+
+    input_file = value_or_prompt(args.input_file, "Enter the full path to the file containing LinkedIn profiles (JSON, XLS, XLSX, CSV, TXT, DOCX, PDF): ")
+    connector = LinkedInConnector(
+        input_file,
+        config.session_file,
+        block_resources=config.block_resources,
+        headless=config.headless,
+        timeout=config.timeout,
+        auto_confirm=args.auto_confirm,
+        add_note=args.add_note,
+        auto_send_note=args.auto_send_note
+    )
+    connector.connect_to_profiles()
 
+# Usage example
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import re
+import sqlite3
+import threading
+import time
+from class_li_urlextractor import canonical_profile_slug
+
+POST_URN_REGEX = re.compile(r"urn:li:(?:activity|share|ugcPost):(\d+)|-activity-(\d+)-", re.IGNORECASE)
+
+def canonical_post_urn(post_url):
+    # Feed links (/feed/update/urn:li:activity:123/) and vanity links (/posts/name_slug-activity-123-abcd) share one key
+    match = POST_URN_REGEX.search(post_url) if isinstance(post_url, str) else None
+    if not match:
+        return None
+    return f"urn:li:activity:{match.group(1) or match.group(2)}"
+
+def post_activity_id(post_url):
+    urn = canonical_post_urn(post_url)
+    return int(urn.rsplit(":", 1)[1]) if urn else None
+
+class LinkedInDedupIndex:
+    profile_actions = ("scraped", "connected")
+    post_actions = ("scraped", "commented")
+
+    def __init__(self, db_file="li_dedup_index.sqlite"):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "slug TEXT PRIMARY KEY, scraped_at REAL, connected_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            "urn TEXT PRIMARY KEY, post_url TEXT, profile_slug TEXT, content TEXT, scraped_at REAL, commented_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS post_watermarks ("
+            "slug TEXT PRIMARY KEY, latest_activity_id INTEGER, updated_at REAL)"
+        )
+        self.connection.commit()
+
+    def action_time(self, table, key_column, key, action):
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT {action}_at FROM {table} WHERE {key_column} = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_recent(self, timestamp, max_age):
+        if timestamp is None:
+            return False
+        return max_age is None or time.time() - timestamp < max_age
+
+    def profile_done(self, profile_url, action, max_age=None):
+        if action not in self.profile_actions:
+            raise ValueError(f"Unknown profile action: {action}")
+        slug = canonical_profile_slug(profile_url)
+        return slug is not None and self.is_recent(self.action_time("profiles", "slug", slug, action), max_age)
+
+    def mark_profile(self, profile_url, action):
+        if action not in self.profile_actions:
+            raise ValueError(f"Unknown profile action: {action}")
+        slug = canonical_profile_slug(profile_url)
+        if slug is None:
+            return
+        with self.lock:
+            self.connection.execute("INSERT OR IGNORE INTO profiles (slug) VALUES (?)", (slug,))
+            self.connection.execute(f"UPDATE profiles SET {action}_at = ? WHERE slug = ?", (time.time(), slug))
+            self.connection.commit()
+
+    def post_done(self, post_url, action, max_age=None):
+        if action not in self.post_actions:
+            raise ValueError(f"Unknown post action: {action}")
+        urn = canonical_post_urn(post_url)
+        return urn is not None and self.is_recent(self.action_time("posts", "urn", urn, action), max_age)
+
+    def mark_post(self, post_url, action, profile_url=None, content=None):
+        if action not in self.post_actions:
+            raise ValueError(f"Unknown post action: {action}")
+        urn = canonical_post_urn(post_url)
+        if urn is None:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO posts (urn, post_url, profile_slug) VALUES (?, ?, ?)",
+                (urn, post_url, canonical_profile_slug(profile_url))
+            )
+            self.connection.execute(f"UPDATE posts SET {action}_at = ? WHERE urn = ?", (time.time(), urn))
+            if content is not None:
+                self.connection.execute("UPDATE posts SET content = ? WHERE urn = ?", (content, urn))
+            self.connection.commit()
+
+    def post_content(self, post_url):
+        urn = canonical_post_urn(post_url)
+        if urn is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT content FROM posts WHERE urn = ? AND scraped_at IS NOT NULL", (urn,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def high_water_mark(self, profile_url):
+        # Latest activity ID seen for the profile; LinkedIn activity IDs grow over time
+        slug = canonical_profile_slug(profile_url)
+        if slug is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT latest_activity_id FROM post_watermarks WHERE slug = ?", (slug,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, profile_url, activity_id):
+        slug = canonical_profile_slug(profile_url)
+        if slug is None or activity_id is None:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO post_watermarks (slug, latest_activity_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(slug) DO UPDATE SET latest_activity_id = MAX(latest_activity_id, excluded.latest_activity_id), updated_at = excluded.updated_at",
+                (slug, activity_id, time.time())
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
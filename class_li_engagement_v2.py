@@ -1,32 +1,63 @@
 import os
 import csv
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 import anthropic
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import Error as PlaywrightError, sync_playwright
 from dotenv import load_dotenv
+from class_li_dedupindex import LinkedInDedupIndex
+from class_li_waits import LinkedInWaiter
+from class_li_runconfig import LinkedInRunConfig, parse_selection, value_or_prompt
 
 load_dotenv()
 
+# Kept well under the API's limit of 100,000 requests (256 MB) per batch, since each request carries a whole post
+BATCH_MAX_REQUESTS = 10000
+
+# Comments already on the post, in the current and the older LinkedIn markup
+COMMENT_ITEM_SELECTOR = "article.comments-comment-entity, article.comments-comment-item"
+
+def posted_comment_selector(response):
+    # The start of the comment is enough to find it; json.dumps quotes it the way Playwright's :has-text() expects
+    snippet = " ".join(response.split())[:60]
+    return ", ".join(f"{selector}:has-text({json.dumps(snippet, ensure_ascii=False)})" for selector in COMMENT_ITEM_SELECTOR.split(", "))
+
 class LinkedInCommentBot:
-    def __init__(self, csv_files, auto_approve=False):
+    def __init__(self, csv_files, auto_approve=False, session_file=".li_session", headless=False, timeout=30000,
+                 batch_drafts=False, draft_workers=4, batch_poll_interval=30, batch_timeout=600):
         self.csv_files = csv_files
         self.auto_approve = auto_approve
+        # Draft every missing response up front, through one Message Batch or a bounded thread pool
+        self.batch_drafts = batch_drafts
+        self.draft_workers = max(1, draft_workers)
+        self.batch_poll_interval = batch_poll_interval
+        # Drafts a batch has not returned by then are made with direct calls instead
+        self.batch_timeout = batch_timeout
+        self.headless = headless
+        self.timeout = timeout
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.li_session_file = ".li_session"
+        self.li_session_file = session_file
         self.client = anthropic.Client(api_key=self.anthropic_api_key)
+        self.index = LinkedInDedupIndex()
+        self.waiter = LinkedInWaiter(default_timeout=timeout)
 
-    def generate_response(self, post_content):
-        print("Generating response using Anthropic API...")
+    def response_params(self, post_content):
         prompt = f"\n\nPlease write a response to the following LinkedIn post content in less than 50 words and end with a profound question, while not referencing any specific names:\n\n{post_content}"
-        response = self.client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=100,
-            temperature=0.7,
-            system="You are an expert content marketer and business development executive that generates responses to LinkedIn posts.",
-            messages=[
+        return {
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 100,
+            "temperature": 0.7,
+            "system": "You are an expert content marketer and business development executive that generates responses to LinkedIn posts.",
+            "messages": [
                 {"role": "user", "content": prompt}
             ]
-        )
+        }
+
+    def generate_response(self, post_content):
+        print("Generating response using Anthropic API...")
+        response = self.client.messages.create(**self.response_params(post_content))
         print("Response generated successfully.")
 
         response_output = response.content[0].text  # Extract the text content from the ContentBlock object
@@ -49,11 +80,25 @@ class LinkedInCommentBot:
 
         for i in range(1, len(rows)):
             row = dict(zip(fieldnames, rows[i]))
-            if "Response" not in row or "Comment Posted" not in row:
+            # A row is finished once it has a Comment Posted verdict; a Response on its own is only a draft.
+            # Rows without content wait for the content scraper, as in pending_drafts
+            pending = not row.get("Comment Posted")
+            if pending and not row.get("Post Content"):
+                print(f"No post content for {row['Post Link']} yet. Skipping.")
+            elif pending and self.index.post_done(row["Post Link"], "commented"):
+                # Commented on in an earlier run or from another CSV file
+                print(f"Already commented on {row['Post Link']}. Skipping.")
+                row["Comment Posted"] = "Yes"
+            elif pending:
                 post_content = row["Post Content"]
+                drafted_response = row.get("Response")
                 retry_count = 0
                 while retry_count < 3:
-                    response = self.generate_response(post_content)
+                    if retry_count == 0 and drafted_response:
+                        # Drafted earlier by draft_responses or the pipeline runner
+                        response = drafted_response
+                    else:
+                        response = self.generate_response(post_content)
                     print(f"\nPost Content:\n{post_content}\n")
                     print(f"Generated Response:\n{response}\n")
                     if self.auto_approve:
@@ -65,6 +110,8 @@ class LinkedInCommentBot:
                         row["Response"] = response
                         post_link = row["Post Link"]
                         comment_posted = self.post_comment(post_link, response)
+                        if comment_posted:
+                            self.index.mark_post(post_link, "commented")
                         row["Comment Posted"] = "Yes" if comment_posted else "No"
                         print("Response approved and posted as a comment.")
                         break
@@ -90,7 +137,7 @@ class LinkedInCommentBot:
     def post_comment(self, post_link, response):
         print(f"Posting comment on LinkedIn post: {post_link}")
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
+            browser = p.chromium.launch(headless=self.headless)
             page = browser.new_page()
 
             # Load cookies from the .li_session file
@@ -102,7 +149,14 @@ class LinkedInCommentBot:
             print("LinkedIn session cookies loaded successfully.")
 
             print("Navigating to the LinkedIn post...")
-            page.goto(post_link)
+            try:
+                page.goto(post_link, timeout=self.timeout)
+            except PlaywrightError as e:
+                # One slow or broken post must not take the rest of the CSV file down with it
+                print(f"Could not load {post_link}: {str(e)}. Comment not posted.")
+                browser.close()
+                return False
+            self.waiter.wait_for(page, ".comments-comment-box__form .ql-editor", label="comment box")
 
             # Like the post
             print("Liking the LinkedIn post...")
@@ -116,60 +170,194 @@ class LinkedInCommentBot:
             # Enter the comment in the text box
             print("Entering the comment in the text box...")
             comment_box = page.query_selector(".comments-comment-box__form .ql-editor")
+            comment_posted = False
             if comment_box:
                 comment_box.type(response)
                 print("Comment entered successfully.")
-                page.wait_for_timeout(3000)
                 
-                # Submit the comment
+                # Submit the comment as soon as the button is enabled
                 print("Submitting the comment...")
-                submit_button = page.query_selector(".comments-comment-box__submit-button")
+                submit_button = self.waiter.wait_for_enabled(page, ".comments-comment-box__submit-button", timeout=5000, label="comment submit button")
                 if submit_button:
                     submit_button.click()
-                    page.wait_for_timeout(2000)
-                    print("Comment submitted successfully.")
-                    return True
+                    # The comment counts as posted once it shows up in the post's comment list
+                    if self.waiter.wait_for(page, posted_comment_selector(response), timeout=5000, label="comment posted"):
+                        print("Comment submitted successfully.")
+                        comment_posted = True
+                    else:
+                        print("Comment did not appear on the post. Comment not posted.")
                 else:
                     print("Submit button not found. Comment not submitted.")
             else:
                 print("Comment box not found. Comment not posted.")
 
             browser.close()
-        return False
+        return comment_posted
+
+    def pending_drafts(self):
+        # Rows across all CSV files that have content but neither a draft nor a comment yet
+        drafts = []
+        for csv_file in self.csv_files:
+            with open(csv_file, "r") as file:
+                rows = list(csv.reader(file))
+            if not rows:
+                continue
+            header = rows[0]
+            for values in rows[1:]:
+                row = dict(zip(header, values))
+                if not row.get("Post Content") or row.get("Response") or row.get("Comment Posted"):
+                    continue
+                if self.index.post_done(row["Post Link"], "commented"):
+                    continue
+                drafts.append((csv_file, row["Post Link"], row["Post Content"]))
+        return drafts
+
+    def draft_with_batches(self, drafts):
+        batches = getattr(self.client.messages, "batches", None)
+        if batches is None:
+            print("Message Batches API not available in this anthropic version.")
+            return {}
+
+        # custom_id must be short and plain, so drafts are addressed by position
+        batch_ids = []
+        for start in range(0, len(drafts), BATCH_MAX_REQUESTS):
+            requests = [
+                {"custom_id": f"draft-{position}", "params": self.response_params(post_content)}
+                for position, (_, _, post_content) in enumerate(drafts[start:start + BATCH_MAX_REQUESTS], start=start)
+            ]
+            try:
+                batch = batches.create(requests=requests)
+            except Exception as e:
+                print(f"Error creating message batch: {str(e)}")
+                break
+            print(f"Submitted message batch {batch.id} with {len(requests)} drafts.")
+            batch_ids.append(batch.id)
+
+        responses = {}
+        deadline = time.monotonic() + self.batch_timeout
+        for batch_id in batch_ids:
+            # Drafts missing from a batch that fails here are left to draft_concurrently
+            try:
+                batch = batches.retrieve(batch_id)
+                while batch.processing_status != "ended" and time.monotonic() < deadline:
+                    print(f"Waiting for message batch {batch_id}: {batch.request_counts.processing} drafts processing...")
+                    time.sleep(min(self.batch_poll_interval, max(0, deadline - time.monotonic())))
+                    batch = batches.retrieve(batch_id)
+                if batch.processing_status != "ended":
+                    print(f"Message batch {batch_id} did not finish in time. Cancelling it.")
+                    batches.cancel(batch_id)
+                    continue
+
+                for result in batches.results(batch_id):
+                    if result.result.type == "succeeded":
+                        position = int(result.custom_id.split("-", 1)[1])
+                        responses[position] = result.result.message.content[0].text
+            except Exception as e:
+                print(f"Error reading message batch {batch_id}: {str(e)}")
+        return responses
+
+    def draft_concurrently(self, drafts):
+        def draft(post_content):
+            try:
+                return self.generate_response(post_content)
+            except Exception as e:
+                print(f"Error generating response: {str(e)}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.draft_workers) as executor:
+            results = executor.map(draft, [post_content for _, _, post_content in drafts])
+            return {position: response for position, response in enumerate(results) if response}
+
+    def draft_responses(self):
+        drafts = self.pending_drafts()
+        if not drafts:
+            return 0
+
+        print(f"Drafting {len(drafts)} responses before posting...")
+        responses = self.draft_with_batches(drafts)
+        missing = [position for position in range(len(drafts)) if position not in responses]
+        if missing:
+            # Anything the batch could not draft goes through a bounded pool of direct calls
+            print(f"Drafting {len(missing)} responses with {self.draft_workers} concurrent requests...")
+            fallback = self.draft_concurrently([drafts[position] for position in missing])
+            responses.update({missing[index]: response for index, response in fallback.items()})
+
+        by_file = {}
+        for position, response in responses.items():
+            csv_file, post_link, _ = drafts[position]
+            by_file.setdefault(csv_file, {})[post_link] = response
+        for csv_file, file_responses in by_file.items():
+            self.write_drafts(csv_file, file_responses)
+        print(f"{len(responses)} of {len(drafts)} responses drafted.")
+        return len(responses)
+
+    def write_drafts(self, csv_file, responses):
+        with open(csv_file, "r") as file:
+            rows = list(csv.reader(file))
+        header = rows[0]
+        if "Response" not in header:
+            header.append("Response")
+        link_index = header.index("Post Link")
+        response_index = header.index("Response")
+        for i in range(1, len(rows)):
+            row = rows[i] + [""] * (len(header) - len(rows[i]))
+            if row[link_index] in responses:
+                row[response_index] = responses[row[link_index]]
+            rows[i] = row
+
+        # Swap the file in whole so an interrupted write never loses the drafts already there
+        temp_file = f"{csv_file}.tmp"
+        with open(temp_file, "w", newline="") as file:
+            csv.writer(file).writerows(rows)
+        os.replace(temp_file, csv_file)
 
     def process_csv_files(self):
+        if self.batch_drafts:
+            self.draft_responses()
+
         print("Processing CSV files...")
         for csv_file in self.csv_files:
             self.process_csv(csv_file)
+        self.index.close()
+        self.waiter.report()
         print("All CSV files processed successfully.")
 
-if __name__ == "__main__":
-    while True:
-        folder_path = input("Enter the folder path for the li_post_links_csv folder containing *_li_posts.csv files (or press Enter to cancel): ")
-        if folder_path == "":
-            break
-
-        csv_files = [file for file in os.listdir(folder_path) if file.endswith("_li_posts.csv")]
-
-        if not csv_files:
-            print("No *_li_posts.csv files found in the specified folder.")
-            continue
+def main():
+    parser = argparse.ArgumentParser(description="Draft and post comments on the posts listed in *_li_posts.csv files.")
+    parser.add_argument("folder", nargs="?", help="Folder with the *_li_posts.csv files (li_post_links_csv)")
+    parser.add_argument("--select", help="Comma-separated numbers of the listed CSV files to process (default all)")
+    parser.add_argument("--auto-approve", action="store_true", help="Post generated responses without asking for approval")
+    parser.add_argument("--batch-drafts", action="store_true", help="Draft all missing responses up front through the Message Batches API before posting")
+    parser.add_argument("--draft-workers", type=int, default=4, help="Concurrent drafting calls when batches are unavailable (default 4)")
+    parser.add_argument("--batch-timeout", type=int, default=600, help="Seconds to wait for a message batch before drafting the rest directly (default 600)")
+    LinkedInRunConfig.add_arguments(parser, concurrency=None, timeout=30000, block_resources=None)
+    args = parser.parse_args()
+    config = LinkedInRunConfig.from_args(args)
 
-        print("Found the following CSV files:")
-        for i, file in enumerate(csv_files, start=1):
-            print(f"{i}. {file}")
+    folder_path = value_or_prompt(args.folder, "Enter the folder path for the li_post_links_csv folder containing *_li_posts.csv files: ")
+    csv_files = [file for file in os.listdir(folder_path) if file.endswith("_li_posts.csv")]
 
-        process_all = input("Do you want to process all the CSV files? (y/n): ").lower() == "y"
+    if not csv_files:
+        print("No *_li_posts.csv files found in the specified folder.")
+        return
 
-        if not process_all:
-            selected_files = input("Enter the numbers of the CSV files you want to process (comma-separated): ")
-            selected_indices = [int(index.strip()) - 1 for index in selected_files.split(",")]
-            csv_files = [csv_files[index] for index in selected_indices]
+    print("Found the following CSV files:")
+    for i, file in enumerate(csv_files, start=1):
+        print(f"{i}. {file}")
+    csv_files = [os.path.join(folder_path, file) for file in parse_selection(args.select, csv_files)]
 
-        csv_files = [os.path.join(folder_path, file) for file in csv_files]
+    bot = LinkedInCommentBot(
+        csv_files,
+        args.auto_approve,
+        session_file=config.session_file,
+        headless=config.headless,
+        timeout=config.timeout,
+        batch_drafts=args.batch_drafts,
+        draft_workers=args.draft_workers,
+        batch_timeout=args.batch_timeout
+    )
+    bot.process_csv_files()
+    print("LinkedIn commenting bot execution completed.")
 
-        auto_approve = input("Do you want to automatically approve responses? (y/n): ").lower() == "y"
-
-        bot = LinkedInCommentBot(csv_files, auto_approve)
-        bot.process_csv_files()
-        print("LinkedIn commenting bot execution completed.")
+if __name__ == "__main__":
+    main()
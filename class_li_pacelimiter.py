@@ -0,0 +1,24 @@
+import asyncio
+import random
+import time
+
+class AsyncPaceLimiter:
+    def __init__(self, requests_per_minute=20, jitter=0.25):
+        # Spread navigations evenly so the whole run stays within the account's request rate
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.jitter = jitter
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+
+        async with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_slot)
+            delay = self.interval * (1 + random.uniform(0, self.jitter))
+            self.next_slot = start + delay
+
+        if start > now:
+            await asyncio.sleep(start - now)
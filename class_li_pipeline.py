@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Full, Queue
+from dotenv import load_dotenv
+from class_li_dedupindex import LinkedInDedupIndex
+from class_li_engagement_v2 import LinkedInCommentBot
+from class_li_postcontentscraper_v2 import LinkedInPostContentScraper
+from class_li_postscraper_v2 import AsyncLinkedInPostScraper, iter_linkedin_profiles, load_cookies_from_file, parse_since
+from class_li_runconfig import LinkedInRunConfig, value_or_prompt
+
+# Marks the end of a stage's input
+DONE = None
+
+class PipelineStopped(Exception):
+    # Raised in a stage waiting on a queue once another stage has failed
+    pass
+
+class StageStats:
+    def __init__(self, name, unit, queue=None):
+        self.name = name
+        self.unit = unit
+        self.queue = queue
+        self.processed = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def count(self, succeeded=True):
+        with self.lock:
+            if succeeded:
+                self.processed += 1
+            else:
+                self.failed += 1
+
+    def summary(self):
+        minutes = max(time.monotonic() - self.started_at, 1) / 60
+        backlog = f", {self.queue.qsize()} queued" if self.queue is not None else ""
+        failed = f", {self.failed} failed" if self.failed else ""
+        return f"{self.name}: {self.processed} {self.unit} ({self.processed / minutes:.1f}/min{backlog}{failed})"
+
+class PostCsvUpdater:
+    # Drafts and posting results reach a CSV only while no stage is rewriting the whole file
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.busy = set()
+        self.pending = {}
+
+    def acquire(self, csv_file):
+        with self.lock:
+            self.busy.add(csv_file)
+
+    def release(self, csv_file):
+        with self.lock:
+            self.busy.discard(csv_file)
+            self.flush(csv_file)
+
+    def update(self, csv_file, post_link, values):
+        with self.lock:
+            self.pending.setdefault(csv_file, {}).setdefault(post_link, {}).update(values)
+            if csv_file not in self.busy:
+                self.flush(csv_file)
+
+    def flush(self, csv_file):
+        updates = self.pending.pop(csv_file, None)
+        if not updates:
+            return
+
+        with open(csv_file, "r", newline="") as file:
+            rows = list(csv.reader(file))
+        header = rows[0]
+        for values in updates.values():
+            for column in values:
+                if column not in header:
+                    header.append(column)
+        link_index = header.index("Post Link") if "Post Link" in header else 0
+
+        for i in range(1, len(rows)):
+            values = updates.get(rows[i][link_index]) if len(rows[i]) > link_index else None
+            if values:
+                row = rows[i] + [""] * (len(header) - len(rows[i]))
+                for column, value in values.items():
+                    row[header.index(column)] = value
+                rows[i] = row
+
+        temp_path = f"{csv_file}.tmp"
+        with open(temp_path, "w", newline="") as file:
+            csv.writer(file).writerows(rows)
+        os.replace(temp_path, csv_file)
+
+class LinkedInPipeline:
+    def __init__(self, config, requests_per_minute=20, incremental=True, harvest=False, max_posts=50, since=None,
+                 draft_workers=4, post_comments=False, queue_size=100, report_every=30):
+        self.config = config
+        self.requests_per_minute = requests_per_minute
+        self.incremental = incremental
+        self.harvest = harvest
+        self.max_posts = max_posts
+        self.since = since
+        self.draft_workers = max(1, draft_workers)
+        # Without post_comments the pipeline stops at drafting and leaves posting to class_li_engagement_v2.py
+        self.post_comments = post_comments
+        self.report_every = report_every
+
+        # Bounded queues let a slow stage hold back the ones feeding it instead of piling up work
+        self.csv_queue = Queue(maxsize=queue_size)
+        self.draft_queue = Queue(maxsize=queue_size)
+        self.post_queue = Queue(maxsize=queue_size)
+        self.stats = {
+            "harvest": StageStats("harvest", "profiles"),
+            "content": StageStats("content", "files", self.csv_queue),
+            "draft": StageStats("draft", "drafts", self.draft_queue),
+            "post": StageStats("post", "comments", self.post_queue)
+        }
+        self.updater = PostCsvUpdater()
+        self.bot = LinkedInCommentBot([], auto_approve=True, session_file=config.session_file, headless=config.headless, timeout=config.timeout)
+        self.stopped = threading.Event()
+        # Set when any stage dies, so the others stop waiting on queues nobody will serve
+        self.failed = threading.Event()
+        self.errors = []
+
+    def put(self, queue, item):
+        while not self.failed.is_set():
+            try:
+                queue.put(item, timeout=1)
+                return
+            except Full:
+                continue
+        raise PipelineStopped()
+
+    def get(self, queue):
+        while not self.failed.is_set():
+            try:
+                return queue.get(timeout=1)
+            except Empty:
+                continue
+        raise PipelineStopped()
+
+    def run_stage(self, name, stage, *args):
+        try:
+            stage(*args)
+        except PipelineStopped:
+            print(f"Pipeline stage {name} stopped after a failure elsewhere.")
+        except Exception as e:
+            print(f"Pipeline stage {name} failed: {str(e)}")
+            self.errors.append(e)
+            self.failed.set()
+            raise
+
+    def harvest_stage(self, input_file):
+        index = None
+        # DONE must reach the content stage however this stage ends, including a missing session file
+        try:
+            cookies = load_cookies_from_file(self.config.session_file)
+            index = LinkedInDedupIndex()
+            scraper = AsyncLinkedInPostScraper(
+                cookies,
+                concurrency=self.config.concurrency,
+                requests_per_minute=self.requests_per_minute,
+                headless=self.config.headless,
+                index=index,
+                incremental=self.incremental,
+                block_resources=self.config.block_resources,
+                timeout=self.config.timeout,
+                harvest=self.harvest,
+                max_posts=self.max_posts,
+                since=self.since,
+                on_scraped=self.on_scraped,
+                stop_event=self.failed
+            )
+            asyncio.run(scraper.run(iter_linkedin_profiles(input_file)))
+        finally:
+            if index is not None:
+                index.close()
+            self.put(self.csv_queue, DONE)
+
+    def on_scraped(self, csv_file):
+        self.stats["harvest"].count()
+        self.put(self.csv_queue, csv_file)
+
+    def content_stage(self):
+        scraper = None
+        try:
+            scraper = LinkedInPostContentScraper(
+                cookie_file=self.config.session_file,
+                headless=self.config.headless,
+                timeout=self.config.timeout,
+                block_resources=self.config.block_resources
+            )
+            while True:
+                csv_file = self.get(self.csv_queue)
+                if csv_file is DONE:
+                    break
+                self.updater.acquire(csv_file)
+                try:
+                    scraper.process_csv_file(csv_file, on_post=self.on_post)
+                    self.stats["content"].count()
+                except PipelineStopped:
+                    raise
+                except Exception as e:
+                    print(f"Error scraping post content for {csv_file}: {str(e)}")
+                    self.stats["content"].count(False)
+                finally:
+                    self.updater.release(csv_file)
+        finally:
+            if scraper is not None:
+                scraper.close()
+            for _ in range(self.draft_workers):
+                self.put(self.draft_queue, DONE)
+
+    def on_post(self, csv_file, row):
+        # Only posts with content that were never drafted or tried need an LLM call; any Comment Posted value is final
+        if row.get("Response") or row.get("Comment Posted"):
+            return
+        if self.bot.index.post_done(row["Post Link"], "commented"):
+            return
+        self.put(self.draft_queue, (csv_file, row["Post Link"], row["Post Content"]))
+
+    def draft_stage(self):
+        while True:
+            item = self.get(self.draft_queue)
+            if item is DONE:
+                break
+            csv_file, post_link, post_content = item
+            try:
+                response = self.bot.generate_response(post_content)
+            except Exception as e:
+                print(f"Error drafting a response for {post_link}: {str(e)}")
+                self.stats["draft"].count(False)
+                continue
+            self.updater.update(csv_file, post_link, {"Response": response})
+            self.stats["draft"].count()
+            if self.post_comments:
+                self.put(self.post_queue, (csv_file, post_link, response))
+
+    def post_stage(self):
+        while True:
+            item = self.get(self.post_queue)
+            if item is DONE:
+                break
+            csv_file, post_link, response = item
+            try:
+                comment_posted = self.bot.post_comment(post_link, response)
+            except Exception as e:
+                print(f"Error posting a comment on {post_link}: {str(e)}")
+                comment_posted = False
+            if comment_posted:
+                self.bot.index.mark_post(post_link, "commented")
+            self.updater.update(csv_file, post_link, {"Comment Posted": "Yes" if comment_posted else "No"})
+            self.stats["post"].count(comment_posted)
+
+    def report(self):
+        stages = ["harvest", "content", "draft"] + (["post"] if self.post_comments else [])
+        print("Pipeline: " + " | ".join(self.stats[stage].summary() for stage in stages))
+
+    def report_stage(self):
+        while not self.stopped.wait(self.report_every):
+            self.report()
+
+    def run(self, input_file):
+        load_dotenv()
+        threads = [
+            threading.Thread(target=self.run_stage, args=("harvest", self.harvest_stage, input_file), name="harvest"),
+            threading.Thread(target=self.run_stage, args=("content", self.content_stage), name="content")
+        ]
+        post_thread = threading.Thread(target=self.run_stage, args=("post", self.post_stage), name="post") if self.post_comments else None
+        reporter = threading.Thread(target=self.report_stage, name="report", daemon=True)
+
+        for thread in threads:
+            thread.start()
+        if post_thread is not None:
+            post_thread.start()
+        reporter.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.draft_workers, thread_name_prefix="draft") as executor:
+                drafts = [executor.submit(self.run_stage, "draft", self.draft_stage) for _ in range(self.draft_workers)]
+            if post_thread is not None:
+                try:
+                    self.put(self.post_queue, DONE)
+                except PipelineStopped:
+                    pass
+                post_thread.join()
+            for thread in threads:
+                thread.join()
+            # A dead draft worker would otherwise go unnoticed; surface the first failure of any stage
+            for draft in drafts:
+                draft.result()
+            if self.errors:
+                raise self.errors[0]
+        finally:
+            self.stopped.set()
+            self.bot.index.close()
+            self.bot.waiter.report()
+            self.report()
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape posts, scrape their content and draft (and optionally post) comments in one overlapping run.")
+    parser.add_argument("input_file", nargs="?", help="File with LinkedIn profile URLs (JSON, JSONL, XLS, XLSX, CSV, TXT, DOCX, PDF)")
+    parser.add_argument("--requests-per-minute", type=int, default=20, help="Profile page loads per minute across all pages (default 20)")
+    parser.add_argument("--full", dest="incremental", action="store_false", help="Overwrite the CSV files instead of merging in new posts")
+    parser.add_argument("--harvest", action="store_true", help="Scroll each profile's recent activity feed and save post content with the links")
+    parser.add_argument("--max-posts", type=int, default=50, help="Posts to harvest per profile (default 50)")
+    parser.add_argument("--since", help="Harvest posts back to this date (YYYY-MM-DD) or this many days ago (e.g. 30)")
+    parser.add_argument("--draft-workers", type=int, default=4, help="Concurrent comment drafting calls (default 4)")
+    parser.add_argument("--post", dest="post_comments", action="store_true", help="Post drafted comments without approval instead of only writing them to the CSV")
+    parser.add_argument("--queue-size", type=int, default=100, help="Items allowed to wait between two stages (default 100)")
+    parser.add_argument("--report-every", type=int, default=30, help="Seconds between throughput reports (default 30)")
+    LinkedInRunConfig.add_arguments(parser, concurrency=3, timeout=60000)
+    args = parser.parse_args()
+
+    input_file = value_or_prompt(args.input_file, "Enter the path to the file with LinkedIn Profile URLs: ")
+    pipeline = LinkedInPipeline(
+        LinkedInRunConfig.from_args(args),
+        requests_per_minute=args.requests_per_minute,
+        incremental=args.incremental,
+        harvest=args.harvest,
+        max_posts=args.max_posts,
+        since=parse_since(args.since),
+        draft_workers=args.draft_workers,
+        post_comments=args.post_comments,
+        queue_size=args.queue_size,
+        report_every=args.report_every
+    )
+    pipeline.run(input_file)
+
+if __name__ == "__main__":
+    main()
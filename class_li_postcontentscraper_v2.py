@@ -1,44 +1,84 @@
+import argparse
 import csv
-import json
 import os
-from playwright.sync_api import sync_playwright
+import time
+from datetime import datetime, timezone
+from class_li_browserpool import LinkedInBrowserPool
+from class_li_dedupindex import LinkedInDedupIndex
+from class_li_postextractor import POST_COLUMNS, extract_post_record, normalize_post_record, record_to_columns
+from class_li_runconfig import LinkedInRunConfig, parse_selection, value_or_prompt
 
 class LinkedInPostContentScraper:
-    def __init__(self, cookie_file=".li_session"):
+    def __init__(self, cookie_file=".li_session", pool_size=1, index=None, flush_every=10, stale_after_days=None, headless=False, timeout=30000, block_resources=True):
         self.cookie_file = cookie_file
-
-    def scrape_post_content(self, post_link):
+        self.timeout = timeout
+        # Completed rows are written back to disk every flush_every scrapes
+        self.flush_every = max(1, flush_every)
+        # Content older than this is scraped again; None means existing content is always kept
+        self.stale_after = stale_after_days * 86400 if stale_after_days else None
+        # One shared browser and cookie load for the whole run; rows are scraped one at a time,
+        # since the sync Playwright objects cannot be shared across threads, so one page is enough
+        self.pool = LinkedInBrowserPool(cookie_file=cookie_file, pool_size=pool_size, headless=headless, block_resources=block_resources)
+        self.index = index if index is not None else LinkedInDedupIndex()
+
+    def scrape_post_record(self, post_link, refresh=False):
+        # Posts already scraped in any earlier run are served from the index without a page load;
+        # only the text is indexed, so the cached record carries just what the link itself encodes
+        cached_content = None if refresh else self.index.post_content(post_link)
+        if cached_content is not None:
+            print(f"Post content already scraped for: {post_link}")
+            return normalize_post_record({"text": cached_content}, post_link)
+
+        record = self.fetch_post_record(post_link)
+        if record and record["text"]:
+            self.index.mark_post(post_link, "scraped", content=record["text"])
+        return record
+
+    def scrape_post_content(self, post_link, refresh=False):
+        record = self.scrape_post_record(post_link, refresh=refresh)
+        return record["text"] if record else ""
+
+    def fetch_post_record(self, post_link):
         print(f"Scraping post content from: {post_link}")
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)  # Run Chromium in non-headless mode
-            context = browser.new_context()
-
-            # Load cookies from file
-            print("Loading cookies from file...")
-            context.add_cookies(self.load_cookies_from_file())
-
-            page = context.new_page()
+        with self.pool.page() as page:
             print("Navigating to the post link...")
-            page.goto(post_link)
+            try:
+                page.goto(post_link, timeout=self.timeout)
+            except Exception as e:
+                print(f"Error navigating to the post link: {str(e)}")
+                return None
 
-            # Find the post content within the specified HTML blocks
+            # Text, author, timestamp, counts, hashtags and media type in a single page.evaluate
             print("Extracting post content...")
-            post_content = page.query_selector(".feed-shared-update-v2__description-wrapper .feed-shared-inline-show-more-text")
-            if post_content:
+            record = extract_post_record(page, post_link)
+            if record and record["text"]:
                 print("Post content found.")
-                return post_content.inner_text()
             else:
                 print("Post content not found.")
-                return ""
-
-            browser.close()
+            return record
 
-    def load_cookies_from_file(self):
-        print(f"Loading cookies from file: {self.cookie_file}")
-        with open(self.cookie_file, 'r') as file:
-            return json.load(file)
+    def close(self):
+        self.pool.close()
+        self.index.close()
 
-    def process_csv_file(self, file_path):
+    def write_rows_atomically(self, file_path, rows):
+        # Write next to the original and swap it in, so a crash never leaves a half-written CSV
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerows(rows)
+        os.replace(temp_path, file_path)
+
+    def is_stale(self, scraped_at):
+        if self.stale_after is None or not scraped_at:
+            return False
+        try:
+            scraped_time = datetime.fromisoformat(scraped_at).timestamp()
+        except ValueError:
+            return True
+        return time.time() - scraped_time > self.stale_after
+
+    def process_csv_file(self, file_path, on_post=None):
         print(f"Processing CSV file: {file_path}")
         
         # Read the CSV file
@@ -46,55 +86,103 @@ class LinkedInPostContentScraper:
             reader = csv.reader(file)
             rows = list(reader)
 
-        # Add a new column for post content
-        rows[0].append("Post Content")
-
-        # Scrape post content for each Post Link
+        if not rows:
+            print(f"CSV file is empty: {file_path}")
+            return
+
+        # Find the columns by name, adding them only if this file has never been processed
+        header = rows[0]
+        for column in POST_COLUMNS + ["Content Scraped At"]:
+            if column not in header:
+                header.append(column)
+        link_index = header.index("Post Link") if "Post Link" in header else 0
+        content_index = header.index("Post Content")
+        scraped_at_index = header.index("Content Scraped At")
+        column_indexes = {column: header.index(column) for column in POST_COLUMNS}
+
+        # Scrape post content only for rows that are empty or stale
+        scraped_since_flush = 0
         for i in range(1, len(rows)):
-            post_link = rows[i][0]  # Assuming Post Link is in the first column
+            row = rows[i] + [""] * (len(header) - len(rows[i]))
+            rows[i] = row
+            post_link = row[link_index]
+            if not post_link:
+                continue
+
+            stale = self.is_stale(row[scraped_at_index])
+            if row[content_index] and not stale:
+                if on_post is not None:
+                    on_post(file_path, dict(zip(header, row)))
+                continue
+
             print(f"Scraping post content for link: {post_link}")
-            post_content = self.scrape_post_content(post_link)
-            rows[i].append(post_content)
+            record = self.scrape_post_record(post_link, refresh=stale)
+            if record:
+                # Cached records only know the text, so keep any metadata an earlier scrape already wrote
+                for column, value in record_to_columns(record).items():
+                    if value or column == "Post Content":
+                        row[column_indexes[column]] = value
+            if row[content_index]:
+                row[scraped_at_index] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+                if on_post is not None:
+                    # Hand each post downstream as soon as its content is known
+                    on_post(file_path, dict(zip(header, row)))
+
+            scraped_since_flush += 1
+            if scraped_since_flush >= self.flush_every:
+                print(f"Flushing progress to CSV file: {file_path}")
+                self.write_rows_atomically(file_path, rows)
+                scraped_since_flush = 0
 
         # Write the updated data back to the CSV file
         print(f"Writing updated data back to CSV file: {file_path}")
-        with open(file_path, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(rows)
+        self.write_rows_atomically(file_path, rows)
 
         print(f"Finished processing CSV file: {file_path}")
 
-# Usage example
-if __name__ == "__main__":
-    scraper = LinkedInPostContentScraper()
+def main():
+    parser = argparse.ArgumentParser(description="Fill the Post Content column of the CSV files written by class_li_postscraper_v2.py.")
+    parser.add_argument("folder", nargs="?", help="Folder with the post link CSV files (li_post_links_csv)")
+    parser.add_argument("--select", help="Comma-separated numbers of the listed CSV files to process (default all)")
+    parser.add_argument("--flush-every", type=int, default=10, help="Write progress back to the CSV every N scraped posts (default 10)")
+    parser.add_argument("--stale-after-days", type=int, help="Scrape existing content again once it is older than this")
+    LinkedInRunConfig.add_arguments(parser, concurrency=None)
+    args = parser.parse_args()
+    config = LinkedInRunConfig.from_args(args)
 
-    # Prompt the user to enter the folder path for li_post_links_csv
-    folder_path = input("Enter the folder path for li_post_links_csv: ")
+    folder_path = value_or_prompt(args.folder, "Enter the folder path for li_post_links_csv: ")
 
     # Get a list of all CSV files in the specified folder
     csv_files = [file for file in os.listdir(folder_path) if file.endswith(".csv")]
 
     if not csv_files:
         print("No CSV files found in the specified folder.")
-    else:
-        print("CSV files found:")
-        for i, file in enumerate(csv_files, start=1):
-            print(f"{i}. {file}")
-
-        # Ask the user if they want to process all files or select specific files
-        process_all = input("Do you want to process all CSV files? (y/n): ")
-
-        if process_all.lower() == "y":
-            selected_files = csv_files
-        else:
-            # Prompt the user to enter the numbers of the files they want to process
-            selected_numbers = input("Enter the numbers of the files you want to process (comma-separated): ")
-            selected_numbers = [int(num.strip()) for num in selected_numbers.split(",")]
-            selected_files = [csv_files[num - 1] for num in selected_numbers]
-
-        # Process each selected CSV file
+        return
+
+    print("CSV files found:")
+    for i, file in enumerate(csv_files, start=1):
+        print(f"{i}. {file}")
+    selected_files = parse_selection(args.select, csv_files)
+
+    scraper = LinkedInPostContentScraper(
+        cookie_file=config.session_file,
+        flush_every=args.flush_every,
+        stale_after_days=args.stale_after_days,
+        headless=config.headless,
+        timeout=config.timeout,
+        block_resources=config.block_resources
+    )
+
+    # Process each selected CSV file, reusing the same browser throughout
+    try:
         for file_name in selected_files:
             file_path = os.path.join(folder_path, file_name)
             print(f"Starting to process CSV file: {file_path}")
             scraper.process_csv_file(file_path)
-            print(f"Finished processing CSV file: {file_path}")
\ No newline at end of file
+            print(f"Finished processing CSV file: {file_path}")
+    finally:
+        scraper.close()
+
+# Usage example
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import re
+from datetime import datetime, timezone
+from class_li_dedupindex import canonical_post_urn, post_activity_id
+
+# Typed columns written next to "Post Link" in the *_li_posts.csv files
+POST_COLUMNS = ["Post Content", "Author", "Author URL", "Post URN", "Posted At", "Reactions", "Comments", "Reposts", "Hashtags", "Media Type"]
+
+# A post page and the recent-activity feed both render posts in this container
+POST_CONTAINER_SELECTOR = "div.feed-shared-update-v2"
+
+# Everything about every matching post is read in one page.evaluate call, so a post costs a single round-trip
+POST_RECORDS_SCRIPT = """
+    (selector) => {
+        const text = (root, selectors) => {
+            for (const selector of selectors) {
+                const element = root.querySelector(selector);
+                if (element && element.innerText.trim()) {
+                    return element.innerText.trim();
+                }
+            }
+            return "";
+        };
+        const mediaType = (root) => {
+            const media = [
+                ["video", ".update-components-linkedin-video, video"],
+                ["document", ".update-components-document__container"],
+                ["poll", ".update-components-poll"],
+                ["article", ".update-components-article"],
+                ["image", ".update-components-image"],
+                ["repost", ".update-components-mini-update-v2, .feed-shared-update-v2__update-content-wrapper"]
+            ];
+            for (const [type, selector] of media) {
+                if (root.querySelector(selector)) {
+                    return type;
+                }
+            }
+            return "text";
+        };
+        return Array.from(document.querySelectorAll(selector)).map(root => {
+            const urnElement = root.closest("[data-urn]") || root.querySelector("[data-urn]");
+            const authorLink = root.querySelector("a.update-components-actor__meta-link, a.update-components-actor__image");
+            const time = root.querySelector("time[datetime]");
+            return {
+                urn: urnElement ? urnElement.getAttribute("data-urn") : "",
+                text: text(root, [
+                    ".feed-shared-update-v2__description-wrapper .feed-shared-inline-show-more-text",
+                    ".update-components-text"
+                ]),
+                author: text(root, [
+                    ".update-components-actor__name span[aria-hidden='true']",
+                    ".update-components-actor__name",
+                    ".update-components-actor__title span[aria-hidden='true']"
+                ]),
+                author_url: authorLink ? authorLink.href.split("?")[0] : "",
+                posted_at: time ? time.getAttribute("datetime") : "",
+                relative_time: text(root, [".update-components-actor__sub-description span[aria-hidden='true']"]),
+                reactions: text(root, [".social-details-social-counts__reactions-count", ".social-details-social-counts__social-proof-fallback-number"]),
+                comments: text(root, [".social-details-social-counts__comments"]),
+                reposts: text(root, [".social-details-social-counts__item--right-aligned:not(.social-details-social-counts__comments)"]),
+                hashtags: Array.from(root.querySelectorAll("a[href*='/feed/hashtag/']")).map(link => link.innerText.trim()),
+                media_type: mediaType(root)
+            };
+        });
+    }
+"""
+
+COUNT_REGEX = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([KkMm])?")
+
+def parse_count(text):
+    # "1,234", "1.2K" and "12 comments" all become plain integers; missing counts are 0
+    match = COUNT_REGEX.search(text or "")
+    if not match:
+        return 0
+    value = float(match.group(1).replace(",", ""))
+    multiplier = {"k": 1000, "m": 1000000}.get((match.group(2) or "").lower(), 1)
+    return int(value * multiplier)
+
+def activity_posted_at(activity_id):
+    # The top 41 bits of a LinkedIn activity ID are the creation time in epoch milliseconds
+    if activity_id is None:
+        return None
+    return datetime.fromtimestamp((activity_id >> 22) / 1000, tz=timezone.utc)
+
+def normalize_post_record(raw, post_link=None):
+    urn = canonical_post_urn(raw.get("urn") or "") or canonical_post_urn(post_link)
+    posted_at = activity_posted_at(post_activity_id(urn)) if urn else None
+    if posted_at is None and raw.get("posted_at"):
+        try:
+            posted_at = datetime.fromisoformat(raw["posted_at"].replace("Z", "+00:00"))
+        except ValueError:
+            posted_at = None
+
+    hashtags = []
+    for hashtag in raw.get("hashtags") or []:
+        hashtag = hashtag.strip().lstrip("#").strip()
+        if hashtag and hashtag.lower() not in [existing.lower() for existing in hashtags]:
+            hashtags.append(hashtag)
+
+    return {
+        "post_link": post_link or (f"https://www.linkedin.com/feed/update/{urn}/" if urn else ""),
+        "text": raw.get("text") or "",
+        "author": raw.get("author") or "",
+        "author_url": raw.get("author_url") or "",
+        "urn": urn or "",
+        "posted_at": posted_at,
+        # Counts stay None when the record did not come from the page, e.g. a cached text-only record
+        "reactions": parse_count(raw["reactions"]) if "reactions" in raw else None,
+        "comments": parse_count(raw["comments"]) if "comments" in raw else None,
+        "reposts": parse_count(raw["reposts"]) if "reposts" in raw else None,
+        "hashtags": hashtags,
+        "media_type": raw.get("media_type") or ""
+    }
+
+def record_to_columns(record):
+    # CSV cells for POST_COLUMNS; counts stay numeric and Posted At is ISO 8601 UTC
+    return {
+        "Post Content": record["text"],
+        "Author": record["author"],
+        "Author URL": record["author_url"],
+        "Post URN": record["urn"],
+        "Posted At": record["posted_at"].isoformat(timespec="seconds") if record["posted_at"] else "",
+        "Reactions": "" if record["reactions"] is None else str(record["reactions"]),
+        "Comments": "" if record["comments"] is None else str(record["comments"]),
+        "Reposts": "" if record["reposts"] is None else str(record["reposts"]),
+        "Hashtags": " ".join(f"#{hashtag}" for hashtag in record["hashtags"]),
+        "Media Type": record["media_type"]
+    }
+
+def extract_post_record(page, post_link=None):
+    raw_records = page.evaluate(POST_RECORDS_SCRIPT, POST_CONTAINER_SELECTOR)
+    if not raw_records:
+        return None
+    return normalize_post_record(raw_records[0], post_link)
+
+async def extract_post_records_async(page, selector=POST_CONTAINER_SELECTOR):
+    raw_records = await page.evaluate(POST_RECORDS_SCRIPT, selector)
+    return [normalize_post_record(raw) for raw in raw_records]
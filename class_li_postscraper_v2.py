@@ -1,177 +1,363 @@
 import os
-from playwright.sync_api import sync_playwright
+import asyncio
+from playwright.async_api import async_playwright
 import json
 import csv
-import re
-import pandas as pd
-import docx
-from PyPDF2 import PdfReader
+import argparse
+from datetime import datetime, timedelta, timezone
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
+from class_li_pacelimiter import AsyncPaceLimiter
+from class_li_resourceblocker import LinkedInResourceBlocker
+from class_li_urlextractor import LinkedInUrlExtractor
+from class_li_runconfig import LinkedInRunConfig, value_or_prompt
+from class_li_dedupindex import LinkedInDedupIndex, canonical_post_urn, post_activity_id
+from class_li_postextractor import POST_COLUMNS, POST_CONTAINER_SELECTOR, extract_post_records_async, record_to_columns
 
-class LinkedInPostScraper:
-    def __init__(self, cookies):
+POST_LINKS_SCRIPT = """
+    () => {
+        const links = Array.from(document.querySelectorAll('.profile-creator-shared-feed-update__mini-container a[data-test-app-aware-link][href^="https://www.linkedin.com/feed/update/"]'));
+        return links.map(link => link.href);
+    }
+"""
+
+# Harvested rows carry the content scraper's columns, so it skips them without loading each post
+HARVEST_COLUMNS = ["Post Link"] + POST_COLUMNS + ["Content Scraped At"]
+
+SCROLL_SCRIPT = "() => window.scrollBy(0, document.body.scrollHeight)"
+
+FEED_SIZE_SCRIPT = "(selector) => document.querySelectorAll(selector).length"
+
+FEED_GREW_SCRIPT = "([selector, count]) => document.querySelectorAll(selector).length > count"
+
+def merge_post_links(csv_filename, post_links, high_water_mark=None):
+    return merge_post_rows(csv_filename, [{"Post Link": link} for link in post_links], high_water_mark)
+
+def merge_post_rows(csv_filename, post_rows, high_water_mark=None):
+    # Keep every existing row (and any scraped content) and only append posts newer than the last run
+    with open(csv_filename, "r", newline="") as csv_file:
+        rows = list(csv.reader(csv_file))
+
+    if not rows:
+        rows = [["Post Link"]]
+    header = rows[0]
+    for post_row in post_rows:
+        for column in post_row:
+            if column not in header:
+                header.append(column)
+    link_index = header.index("Post Link") if "Post Link" in header else 0
+    existing = {canonical_post_urn(row[link_index]) or row[link_index] for row in rows[1:] if len(row) > link_index}
+
+    new_links = []
+    for post_row in post_rows:
+        link = post_row["Post Link"]
+        activity_id = post_activity_id(link)
+        if (canonical_post_urn(link) or link) in existing:
+            continue
+        if high_water_mark is not None and activity_id is not None and activity_id <= high_water_mark:
+            continue
+        new_links.append(link)
+        row = [post_row.get(column, "") for column in header]
+        row[link_index] = link
+        rows.append(row)
+
+    # Write to a temporary file first so an interrupted run never leaves a truncated CSV behind
+    temp_filename = f"{csv_filename}.tmp"
+    with open(temp_filename, "w", newline="") as csv_file:
+        csv.writer(csv_file).writerows(rows)
+    os.replace(temp_filename, csv_filename)
+
+    print(f"{len(new_links)} new post links merged into {csv_filename}")
+    return csv_filename
+
+def save_post_links(person_id, post_links, incremental=False, high_water_mark=None):
+    # Remove duplicate post links
+    unique_post_links = list(dict.fromkeys(post_links))
+
+    print(f"Found {len(unique_post_links)} unique post links")  # Log the number of unique post links found
+
+    # Create the "li_post_links_csv" folder if it doesn't exist
+    folder_name = "li_post_links_csv"
+    if not os.path.exists(folder_name):
+        os.makedirs(folder_name)
+
+    # Save the unique post links to a CSV file in the "li_post_links_csv" folder
+    csv_filename = os.path.join(folder_name, f"{person_id}_li_posts.csv")
+
+    # In incremental mode an existing file is extended rather than replaced
+    if incremental and os.path.exists(csv_filename):
+        return merge_post_links(csv_filename, unique_post_links, high_water_mark)
+
+    # Check if the file already exists
+    if os.path.exists(csv_filename):
+        print(f"File {csv_filename} already exists. Overwriting the file.")
+
+    with open(csv_filename, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Post Link"])
+        for link in unique_post_links:
+            writer.writerow([link])
+
+    print(f"Unique post links saved to {csv_filename}")
+    return csv_filename
+
+def save_post_records(person_id, records, incremental=False, high_water_mark=None):
+    # Same file layout as save_post_links, with content and metadata filled in from the feed
+    scraped_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    post_rows = []
+    for record in records:
+        post_row = {"Post Link": record["post_link"], **record_to_columns(record)}
+        post_row["Content Scraped At"] = scraped_at if record["text"] else ""
+        post_rows.append(post_row)
+
+    folder_name = "li_post_links_csv"
+    if not os.path.exists(folder_name):
+        os.makedirs(folder_name)
+    csv_filename = os.path.join(folder_name, f"{person_id}_li_posts.csv")
+
+    if incremental and os.path.exists(csv_filename):
+        return merge_post_rows(csv_filename, post_rows, high_water_mark)
+
+    if os.path.exists(csv_filename):
+        print(f"File {csv_filename} already exists. Overwriting the file.")
+
+    with open(csv_filename, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(HARVEST_COLUMNS)
+        for post_row in post_rows:
+            writer.writerow([post_row.get(column, "") for column in HARVEST_COLUMNS])
+
+    print(f"{len(post_rows)} harvested posts saved to {csv_filename}")
+    return csv_filename
+
+class AsyncLinkedInPostScraper:
+    def __init__(self, cookies, concurrency=3, requests_per_minute=20, headless=False, index=None, rescrape_after_hours=12, incremental=True, block_resources=True, timeout=60000, harvest=False, max_posts=50, since=None, max_scrolls=30, on_scraped=None, stop_event=None):
         self.cookies = cookies
+        # Called with each finished CSV file so a downstream stage can start on it straight away
+        self.on_scraped = on_scraped
+        # Set by a caller that needs the remaining profiles abandoned, e.g. when a downstream stage has failed
+        self.stop_event = stop_event
+        self.timeout = timeout
+        # Harvest mode scrolls the recent-activity feed instead of reading the handful of posts on the profile page
+        self.harvest = harvest
+        self.max_posts = max_posts
+        self.since = since
+        self.max_scrolls = max_scrolls
+        self.concurrency = max(1, concurrency)
+        self.headless = headless
+        self.pace_limiter = AsyncPaceLimiter(requests_per_minute)
+        self.resource_blocker = LinkedInResourceBlocker() if block_resources else None
+        # Profiles scraped more recently than this in any earlier run are skipped
+        self.index = index
+        self.rescrape_after = rescrape_after_hours * 3600
+        # Incremental runs merge new posts into the existing CSV, using a per-profile high-water mark
+        self.incremental = incremental
 
-    def scrape_posts(self, linkedin_url, person_id):
+    async def scrape_posts(self, page, linkedin_url, person_id):
         # Ensure the LinkedIn URL ends with a trailing slash
         if not linkedin_url.endswith("/"):
             linkedin_url += "/"
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            
+        await self.pace_limiter.wait()
+        try:
+            # Navigation only needs the DOM; the selector wait below covers the feed rendering
+            await page.goto(linkedin_url, timeout=self.timeout, wait_until="domcontentloaded")
+            await page.wait_for_selector('.profile-creator-shared-feed-update__mini-container', timeout=self.timeout)
+            print(f"Navigated to: {page.url}")
+        except Exception as e:
+            print(f"Error navigating to LinkedIn profile page for person with ID: {person_id}")
+            print(f"Error message: {str(e)}")
+            return None
+
+        post_links = await page.evaluate(POST_LINKS_SCRIPT)
+        high_water_mark = self.index.high_water_mark(linkedin_url) if self.index is not None and self.incremental else None
+        # File IO runs off the event loop so the other pages keep scraping while the CSV is merged and written
+        csv_filename = await asyncio.to_thread(save_post_links, person_id, post_links, incremental=self.incremental, high_water_mark=high_water_mark)
+        if self.index is not None:
+            self.index.mark_profile(linkedin_url, "scraped")
+            activity_ids = [activity_id for activity_id in map(post_activity_id, post_links) if activity_id is not None]
+            if activity_ids:
+                self.index.set_high_water_mark(linkedin_url, max(activity_ids))
+        return csv_filename
+
+    async def harvest_posts(self, page, linkedin_url, person_id):
+        if not linkedin_url.endswith("/"):
+            linkedin_url += "/"
+        activity_url = f"{linkedin_url}recent-activity/all/"
+
+        await self.pace_limiter.wait()
+        try:
+            await page.goto(activity_url, timeout=self.timeout, wait_until="domcontentloaded")
+            await page.wait_for_selector(POST_CONTAINER_SELECTOR, timeout=self.timeout)
+            print(f"Navigated to: {page.url}")
+        except Exception as e:
+            print(f"Error navigating to LinkedIn recent activity page for person with ID: {person_id}")
+            print(f"Error message: {str(e)}")
+            return None
+
+        high_water_mark = self.index.high_water_mark(linkedin_url) if self.index is not None and self.incremental else None
+        records = {}
+        for scroll in range(self.max_scrolls + 1):
+            # Link, text, timestamp and counts for every rendered post in one evaluate
+            for record in await extract_post_records_async(page):
+                if record["urn"]:
+                    records[record["urn"]] = record
+
+            activity_ids = [post_activity_id(urn) for urn in records]
+            oldest_posted_at = min((record["posted_at"] for record in records.values() if record["posted_at"]), default=None)
+            if len(records) >= self.max_posts:
+                break
+            if self.since is not None and oldest_posted_at is not None and oldest_posted_at < self.since:
+                break
+            if high_water_mark is not None and activity_ids and min(activity_ids) <= high_water_mark:
+                # Everything further down was already harvested in an earlier run
+                break
+
+            # Scroll and wait for LinkedIn to render the next page of the feed
+            rendered = await page.evaluate(FEED_SIZE_SCRIPT, POST_CONTAINER_SELECTOR)
+            await page.evaluate(SCROLL_SCRIPT)
             try:
-                context = browser.new_context()
-            except Exception as e:
-                print(f"Error creating a new context: {str(e)}")
-                browser.close()
-                return
-            
-            if context is None:
-                print(f"Failed to create a new context for person with ID: {person_id}. Skipping.")
-                browser.close()
-                return
-            
-            context.add_cookies(self.cookies)
-            page = context.new_page()
-            
+                await page.wait_for_function(FEED_GREW_SCRIPT, arg=[POST_CONTAINER_SELECTOR, rendered], timeout=self.timeout)
+            except PlaywrightTimeoutError:
+                print(f"No more posts loaded after {scroll + 1} scrolls for person with ID: {person_id}")
+                break
+
+        # Newest first, cut at the date and the target count
+        harvested = sorted(records.values(), key=lambda record: post_activity_id(record["urn"]), reverse=True)
+        if self.since is not None:
+            harvested = [record for record in harvested if record["posted_at"] is None or record["posted_at"] >= self.since]
+        harvested = harvested[:self.max_posts]
+        print(f"Harvested {len(harvested)} posts from the recent activity feed")
+
+        csv_filename = await asyncio.to_thread(save_post_records, person_id, harvested, incremental=self.incremental, high_water_mark=high_water_mark)
+        if self.index is not None:
+            self.index.mark_profile(linkedin_url, "scraped")
+            for record in harvested:
+                if record["text"]:
+                    self.index.mark_post(record["post_link"], "scraped", profile_url=linkedin_url, content=record["text"])
+            if harvested:
+                self.index.set_high_water_mark(linkedin_url, post_activity_id(harvested[0]["urn"]))
+        return csv_filename
+
+    async def worker(self, context, profiles):
+        page = await context.new_page()
+        try:
+            while not profiles.empty() and not (self.stop_event is not None and self.stop_event.is_set()):
+                linkedin_url, person_id = profiles.get_nowait()
+                try:
+                    if self.harvest:
+                        csv_filename = await self.harvest_posts(page, linkedin_url, person_id)
+                    else:
+                        csv_filename = await self.scrape_posts(page, linkedin_url, person_id)
+                    if csv_filename and self.on_scraped is not None:
+                        # The callback may block on a full queue, so keep it off the event loop
+                        await asyncio.to_thread(self.on_scraped, csv_filename)
+                except Exception as e:
+                    print(f"Error scraping posts for person with ID: {person_id}")
+                    print(f"Error message: {str(e)}")
+                    # Start over with a clean page if the previous one is in a bad state
+                    if page.is_closed():
+                        page = await context.new_page()
+        finally:
+            if not page.is_closed():
+                await page.close()
+
+    async def run(self, profiles):
+        queue = asyncio.Queue()
+        for linkedin_url, person_id in profiles:
+            if self.index is not None and self.index.profile_done(linkedin_url, "scraped", max_age=self.rescrape_after):
+                print(f"Skipping {linkedin_url}: posts already scraped in the last {self.rescrape_after // 3600} hours")
+                continue
+            queue.put_nowait((linkedin_url, person_id))
+
+        if queue.empty():
+            print("No LinkedIn profile URLs found.")
+            return
+
+        print(f"Scraping {queue.qsize()} profiles with {self.concurrency} concurrent pages...")
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.headless)
             try:
-                # Navigate to the LinkedIn profile page with timeout
-                page.goto(linkedin_url, timeout=60000)  # Increase the timeout to 60 seconds
-                page.wait_for_selector('.profile-creator-shared-feed-update__mini-container', timeout=30000)  # Wait for a specific element to load
-                print(f"Navigated to: {page.url}")  # Log the current URL
-
-                # Wait for 5 seconds before extracting post links
-                page.wait_for_timeout(5000)
-                
-            except Exception as e:
-                print(f"Error navigating to LinkedIn profile page for person with ID: {person_id}")
-                print(f"Error message: {str(e)}")
-                browser.close()
-                return
-            
-            # Extract the links to posts
-            post_links = page.evaluate("""
-                () => {
-                    const links = Array.from(document.querySelectorAll('.profile-creator-shared-feed-update__mini-container a[data-test-app-aware-link][href^="https://www.linkedin.com/feed/update/"]'));
-                    return links.map(link => link.href);
-                }
-            """)
-            
-            # Remove duplicate post links
-            unique_post_links = set(post_links)
-            
-            print(f"Found {len(unique_post_links)} unique post links")  # Log the number of unique post links found
-            
-            # Create the "li_post_links_csv" folder if it doesn't exist
-            folder_name = "li_post_links_csv"
-            if not os.path.exists(folder_name):
-                os.makedirs(folder_name)
-            
-            # Save the unique post links to a CSV file in the "li_post_links_csv" folder
-            csv_filename = os.path.join(folder_name, f"{person_id}_li_posts.csv")
-            
-            # Check if the file already exists
-            if os.path.exists(csv_filename):
-                print(f"File {csv_filename} already exists. Overwriting the file.")
-            
-            with open(csv_filename, "w", newline="") as csv_file:
-                writer = csv.writer(csv_file)
-                writer.writerow(["Post Link"])
-                for link in unique_post_links:
-                    writer.writerow([link])
-            
-            print(f"Unique post links saved to {csv_filename}")
-            
-            # Close the browser
-            browser.close()
-            
+                context = await browser.new_context()
+                await context.add_cookies(self.cookies)
+                if self.resource_blocker is not None:
+                    await self.resource_blocker.install_async(context)
+                workers = [self.worker(context, queue) for _ in range(min(self.concurrency, queue.qsize()))]
+                await asyncio.gather(*workers)
+            finally:
+                await browser.close()
+                if self.resource_blocker is not None:
+                    self.resource_blocker.report()
+
 def load_cookies_from_file(file_path):
     with open(file_path, "r") as file:
         cookie_data = json.load(file)
     return cookie_data
 
-def agent_scrape_linkedin_posts(individuals_data_file):
+def iter_linkedin_profiles(individuals_data_file):
+    # Profile slugs double as person IDs for the {person_id}_li_posts.csv outputs
+    return LinkedInUrlExtractor(individuals_data_file).iter_profiles()
+
+def agent_scrape_linkedin_posts(individuals_data_file, concurrency=3, requests_per_minute=20, incremental=True, rescrape_after_hours=12, config=None, harvest=False, max_posts=50, since=None):
     # Load the .env file
     load_dotenv()
+    config = config or LinkedInRunConfig(concurrency=concurrency, timeout=60000)
     
     # Load all the cookies from the .li_session file
-    cookies_file = ".li_session"
-    cookies = load_cookies_from_file(cookies_file)
-    
-    scraper = LinkedInPostScraper(cookies)
-    
-    file_extension = os.path.splitext(individuals_data_file)[1].lower()
-    
-    if file_extension == ".json":
-        with open(individuals_data_file, "r") as file:
-            individuals_data = json.load(file)
-        
-        for person_data in individuals_data:
-            if "person" in person_data:
-                linkedin_url = None
-                for key, value in person_data["person"].items():
-                    if isinstance(value, str) and value.startswith("https://www.linkedin.com/in/"):
-                        linkedin_url = value
-                        break
-                
-                if linkedin_url:
-                    person_id = re.findall(r"https://www.linkedin.com/in/(.+)", linkedin_url)[0]
-                    scraper.scrape_posts(linkedin_url, person_id)
-                else:
-                    print(f"LinkedIn profile URL not found for person with ID: {person_data['person']['id']}")
-            else:
-                print(f"Person data not found for entry: {person_data}")
-    
-    elif file_extension in [".xls", ".xlsx"]:
-        df = pd.read_excel(individuals_data_file)
-        for _, row in df.iterrows():
-            for value in row.values:
-                if isinstance(value, str) and value.startswith("https://www.linkedin.com/in/"):
-                    linkedin_url = value
-                    person_id = re.findall(r"https://www.linkedin.com/in/(.+)", linkedin_url)[0]
-                    scraper.scrape_posts(linkedin_url, person_id)
-    
-    elif file_extension == ".csv":
-        with open(individuals_data_file, "r") as file:
-            reader = csv.reader(file)
-            for row in reader:
-                for value in row:
-                    if value.startswith("https://www.linkedin.com/in/"):
-                        linkedin_url = value
-                        person_id = re.findall(r"https://www.linkedin.com/in/(.+)", linkedin_url)[0]
-                        scraper.scrape_posts(linkedin_url, person_id)
+    cookies = load_cookies_from_file(config.session_file)
     
-    elif file_extension == ".txt":
-        with open(individuals_data_file, "r") as file:
-            for line in file:
-                if line.startswith("https://www.linkedin.com/in/"):
-                    linkedin_url = line.strip()
-                    person_id = re.findall(r"https://www.linkedin.com/in/(.+)", linkedin_url)[0]
-                    scraper.scrape_posts(linkedin_url, person_id)
-    
-    elif file_extension == ".docx":
-        doc = docx.Document(individuals_data_file)
-        for paragraph in doc.paragraphs:
-            if paragraph.text.startswith("https://www.linkedin.com/in/"):
-                linkedin_url = paragraph.text.strip()
-                person_id = re.findall(r"https://www.linkedin.com/in/(.+)", linkedin_url)[0]
-                scraper.scrape_posts(linkedin_url, person_id)
-    
-    elif file_extension == ".pdf":
-        with open(individuals_data_file, "rb") as file:
-            pdf_reader = PdfReader(file)
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                urls = re.findall(r"https://www.linkedin.com/in/\S+", text)
-                for linkedin_url in urls:
-                    person_id = re.findall(r"https://www.linkedin.com/in/(.+)", linkedin_url)[0]
-                    scraper.scrape_posts(linkedin_url, person_id)
-    
-    else:
-        print(f"Unsupported file format: {file_extension}")
+    index = LinkedInDedupIndex()
+    scraper = AsyncLinkedInPostScraper(
+        cookies,
+        concurrency=config.concurrency,
+        requests_per_minute=requests_per_minute,
+        headless=config.headless,
+        index=index,
+        rescrape_after_hours=rescrape_after_hours,
+        incremental=incremental,
+        block_resources=config.block_resources,
+        timeout=config.timeout,
+        harvest=harvest,
+        max_posts=max_posts,
+        since=since
+    )
+    try:
+        asyncio.run(scraper.run(iter_linkedin_profiles(individuals_data_file)))
+    finally:
+        index.close()
+
+
+def parse_since(value):
+    if not value:
+        return None
+    if value.isdigit():
+        return datetime.now(timezone.utc) - timedelta(days=int(value))
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape post links from LinkedIn profiles into li_post_links_csv/.")
+    parser.add_argument("input_file", nargs="?", help="File with LinkedIn profile URLs (JSON, JSONL, XLS, XLSX, CSV, TXT, DOCX, PDF)")
+    parser.add_argument("--requests-per-minute", type=int, default=20, help="Profile page loads per minute across all pages (default 20)")
+    parser.add_argument("--rescrape-after-hours", type=int, default=12, help="Skip profiles scraped more recently than this (default 12)")
+    parser.add_argument("--full", dest="incremental", action="store_false", help="Overwrite the CSV files instead of merging in new posts")
+    parser.add_argument("--harvest", action="store_true", help="Scroll each profile's recent activity feed and save post content with the links")
+    parser.add_argument("--max-posts", type=int, default=50, help="Posts to harvest per profile (default 50)")
+    parser.add_argument("--since", help="Harvest posts back to this date (YYYY-MM-DD) or this many days ago (e.g. 30)")
+    LinkedInRunConfig.add_arguments(parser, concurrency=3, timeout=60000)
+    args = parser.parse_args()
 
+    individuals_data_file = value_or_prompt(args.input_file, "Enter the path to the file with LinkedIn Profile URLs: ")
+    agent_scrape_linkedin_posts(
+        individuals_data_file,
+        requests_per_minute=args.requests_per_minute,
+        incremental=args.incremental,
+        rescrape_after_hours=args.rescrape_after_hours,
+        config=LinkedInRunConfig.from_args(args),
+        harvest=args.harvest,
+        max_posts=args.max_posts,
+        since=parse_since(args.since)
+    )
 
 # Example usage
-individuals_data_file = input("Enter the path to the file with LinkedIn Profile URLs: ")
-agent_scrape_linkedin_posts(individuals_data_file)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import re
+import threading
+
+# Resource types the read-only stages never look at
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# Tracking and ad beacons, blocked whatever their resource type
+ANALYTICS_REGEX = re.compile(
+    r"(google-analytics\.com|googletagmanager\.com|doubleclick\.net|px\.ads\.linkedin\.com|"
+    r"linkedin\.com/(li/track|collect)|snap\.licdn\.com/li\.lms-analytics|bat\.bing\.com|facebook\.net)",
+    re.IGNORECASE
+)
+
+# Aborted requests never report a size, so savings are estimated from typical LinkedIn asset sizes
+ESTIMATED_BYTES = {
+    "image": 40000,
+    "media": 500000,
+    "font": 30000,
+    "analytics": 2000
+}
+
+class LinkedInResourceBlocker:
+    def __init__(self, blocked_types=BLOCKED_RESOURCE_TYPES, block_analytics=True):
+        self.blocked_types = set(blocked_types)
+        self.block_analytics = block_analytics
+        self.blocked = {}
+        self.lock = threading.Lock()
+
+    def category(self, request):
+        if self.block_analytics and ANALYTICS_REGEX.search(request.url):
+            return "analytics"
+        if request.resource_type in self.blocked_types:
+            return request.resource_type
+        return None
+
+    def count(self, category):
+        with self.lock:
+            self.blocked[category] = self.blocked.get(category, 0) + 1
+
+    def handle_route(self, route):
+        category = self.category(route.request)
+        if category is None:
+            route.continue_()
+            return
+        self.count(category)
+        route.abort()
+
+    async def handle_route_async(self, route):
+        category = self.category(route.request)
+        if category is None:
+            await route.continue_()
+            return
+        self.count(category)
+        await route.abort()
+
+    def install(self, context):
+        context.route("**/*", self.handle_route)
+        return context
+
+    async def install_async(self, context):
+        await context.route("**/*", self.handle_route_async)
+        return context
+
+    def estimated_bytes_saved(self):
+        return sum(ESTIMATED_BYTES.get(category, 0) * count for category, count in self.blocked.items())
+
+    def report(self):
+        total = sum(self.blocked.values())
+        if not total:
+            return
+        breakdown = ", ".join(f"{count} {category}" for category, count in sorted(self.blocked.items()))
+        print(f"Blocked {total} requests ({breakdown}), ~{self.estimated_bytes_saved() / 1048576:.1f} MB saved (estimated)")
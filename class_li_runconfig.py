@@ -0,0 +1,44 @@
+class LinkedInRunConfig:
+    def __init__(self, headless=False, concurrency=1, timeout=30000, block_resources=True, session_file=".li_session"):
+        self.headless = headless
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.block_resources = block_resources
+        self.session_file = session_file
+
+    @staticmethod
+    def add_arguments(parser, concurrency=1, timeout=30000, block_resources=True):
+        # The same browser flags for every Playwright stage; defaults differ per stage
+        group = parser.add_argument_group("browser options")
+        group.add_argument("--headless", action="store_true", help="Run Chromium without a visible window")
+        # Stages that work one page at a time or write to LinkedIn pass None to leave a flag out
+        if concurrency is not None:
+            group.add_argument("--concurrency", type=int, default=concurrency, help=f"Number of pages worked in parallel (default {concurrency})")
+        group.add_argument("--timeout", type=int, default=timeout, help=f"Navigation and wait timeout in milliseconds (default {timeout})")
+        if block_resources:
+            group.add_argument("--no-block-resources", dest="block_resources", action="store_false", help="Load images, media, fonts and analytics")
+        elif block_resources is not None:
+            group.add_argument("--block-resources", dest="block_resources", action="store_true", help="Skip images, media, fonts and analytics")
+        group.add_argument("--session-file", default=".li_session", help="Cookie file written by class_li_login.py (default .li_session)")
+        return parser
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            headless=args.headless,
+            concurrency=getattr(args, "concurrency", 1),
+            timeout=args.timeout,
+            block_resources=getattr(args, "block_resources", False),
+            session_file=args.session_file
+        )
+
+def parse_selection(selection, options):
+    # "1,3" picks by position from the listed files; an empty selection means all of them
+    if not selection:
+        return options
+    indices = [int(index.strip()) - 1 for index in selection.split(",") if index.strip()]
+    return [options[index] for index in indices]
+
+def value_or_prompt(value, prompt):
+    # Arguments win; interactive runs without them still get the original question
+    return value if value is not None else input(prompt)
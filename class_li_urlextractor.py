@@ -0,0 +1,115 @@
+import csv
+import os
+import re
+from urllib.parse import quote, unquote
+import docx
+import pandas as pd
+from openpyxl import load_workbook
+from PyPDF2 import PdfReader
+from class_jsonl_store import iter_json_records
+
+# One pattern for every input format: any linkedin.com/in/ profile link, with or without a country subdomain
+LINKEDIN_PROFILE_REGEX = re.compile(r"https?://(?:[a-z]{2,3}\.)?linkedin\.com/in/([^/?#\s\"'<>,;)\]]+)", re.IGNORECASE)
+
+def canonical_profile_slug(value):
+    match = LINKEDIN_PROFILE_REGEX.search(value) if isinstance(value, str) else None
+    return unquote(match.group(1)).strip().lower() if match else None
+
+def profile_url_from_slug(slug):
+    return f"https://www.linkedin.com/in/{quote(slug)}/"
+
+class LinkedInUrlExtractor:
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self.file_extension = os.path.splitext(input_file)[1].lower()
+
+    def iter_text(self):
+        # Each reader yields small pieces of text as it goes, so large exports start producing URLs immediately
+        if self.file_extension in [".json", ".jsonl"]:
+            return self.iter_json_text()
+        if self.file_extension == ".xlsx":
+            return self.iter_xlsx_text()
+        if self.file_extension == ".xls":
+            return self.iter_xls_text()
+        if self.file_extension == ".csv":
+            return self.iter_csv_text()
+        if self.file_extension == ".txt":
+            return self.iter_txt_text()
+        if self.file_extension == ".docx":
+            return self.iter_docx_text()
+        if self.file_extension == ".pdf":
+            return self.iter_pdf_text()
+        print(f"Unsupported file format: {self.file_extension}")
+        return iter(())
+
+    def iter_json_text(self):
+        for record in iter_json_records(self.input_file):
+            strings = list(self.iter_strings(record))
+            if not any(LINKEDIN_PROFILE_REGEX.search(value) for value in strings):
+                person = record.get("person") if isinstance(record, dict) else None
+                if isinstance(person, dict):
+                    print(f"LinkedIn profile URL not found for person with ID: {person.get('id')}")
+                else:
+                    print(f"Person data not found for entry: {record}")
+            yield from strings
+
+    def iter_strings(self, value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from self.iter_strings(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from self.iter_strings(item)
+
+    def iter_xlsx_text(self):
+        workbook = load_workbook(self.input_file, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                for row in worksheet.iter_rows(values_only=True):
+                    for value in row:
+                        if isinstance(value, str):
+                            yield value
+        finally:
+            workbook.close()
+
+    def iter_xls_text(self):
+        # The legacy binary format has no streaming reader, so fall back to pandas
+        for _, row in pd.read_excel(self.input_file, dtype=str).iterrows():
+            for value in row.values:
+                if isinstance(value, str):
+                    yield value
+
+    def iter_csv_text(self):
+        with open(self.input_file, "r", newline="") as file:
+            for row in csv.reader(file):
+                yield from row
+
+    def iter_txt_text(self):
+        with open(self.input_file, "r") as file:
+            yield from file
+
+    def iter_docx_text(self):
+        for paragraph in docx.Document(self.input_file).paragraphs:
+            yield paragraph.text
+
+    def iter_pdf_text(self):
+        with open(self.input_file, "rb") as file:
+            pdf_reader = PdfReader(file)
+            for page in pdf_reader.pages:
+                yield page.extract_text() or ""
+
+    def iter_profiles(self):
+        # Yields (profile_url, slug) pairs, normalized and deduplicated, as soon as they are found
+        seen = set()
+        for text in self.iter_text():
+            for match in LINKEDIN_PROFILE_REGEX.finditer(text):
+                slug = unquote(match.group(1)).strip().lower()
+                if slug and slug not in seen:
+                    seen.add(slug)
+                    yield profile_url_from_slug(slug), slug
+
+    def iter_urls(self):
+        for profile_url, _ in self.iter_profiles():
+            yield profile_url
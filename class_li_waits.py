@@ -0,0 +1,41 @@
+import time
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+class LinkedInWaiter:
+    def __init__(self, default_timeout=10000):
+        self.default_timeout = default_timeout
+        self.timings = {}
+
+    def record(self, label, started_at, succeeded):
+        elapsed = time.monotonic() - started_at
+        stats = self.timings.setdefault(label, {"count": 0, "timeouts": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        if not succeeded:
+            stats["timeouts"] += 1
+        return elapsed
+
+    def wait_for(self, page, selector, state="visible", timeout=None, label=None):
+        # Returns as soon as the element reaches the state, or None once the timeout runs out
+        label = label or selector
+        started_at = time.monotonic()
+        try:
+            element = page.wait_for_selector(selector, state=state, timeout=timeout or self.default_timeout)
+        except PlaywrightTimeoutError:
+            elapsed = self.record(label, started_at, False)
+            print(f"Timed out after {elapsed:.1f}s waiting for {label}")
+            return None
+        self.record(label, started_at, True)
+        return element if element is not None else True
+
+    def wait_for_enabled(self, page, selector, timeout=None, label=None):
+        return self.wait_for(page, f"{selector}:not([disabled])", timeout=timeout, label=label or selector)
+
+    def report(self):
+        if not self.timings:
+            return
+        print("Wait timings:")
+        for label, stats in self.timings.items():
+            average = stats["total"] / stats["count"]
+            print(f"  {label}: {stats['count']} waits, avg {average:.2f}s, max {stats['max']:.2f}s, {stats['timeouts']} timeouts")
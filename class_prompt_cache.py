@@ -0,0 +1,39 @@
+import threading
+
+def cached_block(text):
+    # Everything up to and including this block is cached for ~5 minutes and re-read at a tenth of the input price.
+    # Prefixes shorter than the model's minimum (1024 tokens for Opus, 2048 for Haiku) are simply not cached.
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+def text_block(text):
+    return {"type": "text", "text": text}
+
+class PromptCacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def record(self, label, response):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return response
+        with self.lock:
+            stats = self.calls.setdefault(label, {"calls": 0, "input": 0, "cache_write": 0, "cache_read": 0, "output": 0})
+            stats["calls"] += 1
+            stats["input"] += getattr(usage, "input_tokens", 0) or 0
+            stats["cache_write"] += getattr(usage, "cache_creation_input_tokens", 0) or 0
+            stats["cache_read"] += getattr(usage, "cache_read_input_tokens", 0) or 0
+            stats["output"] += getattr(usage, "output_tokens", 0) or 0
+        return response
+
+    def report(self):
+        if not self.calls:
+            return
+        print("Prompt cache usage (input tokens):")
+        for label, stats in self.calls.items():
+            total_input = stats["input"] + stats["cache_write"] + stats["cache_read"]
+            hit_rate = stats["cache_read"] / total_input * 100 if total_input else 0
+            print(
+                f"  {label}: {stats['calls']} calls, {stats['input']} uncached, {stats['cache_write']} cache writes, "
+                f"{stats['cache_read']} cache reads ({hit_rate:.0f}% read from cache), {stats['output']} output"
+            )
@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+def normalize_url(url):
+    # Citations often end in punctuation and carry tracking parameters; neither makes a different article
+    url = url.strip().rstrip(".,;:!?)]}>'\"")
+    if url.startswith("www."):
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return None
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query) if not key.lower().startswith("utm_")])
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower() or "https", parts.netloc.lower(), path, query, ""))
+
+def research_key(region, subject):
+    return f"{' '.join(region.lower().split())}|{' '.join(subject.lower().split())}"
+
+class ResearchCache:
+    def __init__(self, cache_file="research_cache.json", ttl_hours=24):
+        self.cache_file = cache_file
+        self.ttl = ttl_hours * 3600
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            print(f"Ignoring unreadable research cache: {self.cache_file}")
+            return {}
+
+    def save(self):
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(self.entries, file, indent=2)
+        os.replace(temp_file, self.cache_file)
+
+    def fresh_urls(self, key):
+        # Each URL keeps the time it was last found, so old results expire even while new ones keep arriving
+        entry = self.entries.get(key) or {}
+        found_at = entry.get("found_at")
+        if found_at is None:
+            # Older cache files kept one timestamp for the whole subject
+            found_at = {url: entry.get("updated_at", 0) for url in entry.get("urls", [])}
+        now = time.time()
+        return {url: timestamp for url, timestamp in found_at.items() if now - timestamp <= self.ttl}
+
+    def urls(self, region, subject):
+        # Stale research is dropped so a later run on the same subject searches again
+        with self.lock:
+            return list(self.fresh_urls(research_key(region, subject)))
+
+    def add(self, region, subject, urls):
+        # Accumulates unique URLs across searches and returns everything known for the subject
+        key = research_key(region, subject)
+        with self.lock:
+            found_at = self.fresh_urls(key)
+            now = time.time()
+            for url in urls:
+                normalized = normalize_url(url)
+                if normalized:
+                    found_at[normalized] = now
+            self.entries[key] = {"found_at": found_at}
+            self.save()
+            return list(found_at)
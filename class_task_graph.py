@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+class TaskGraph:
+    # Runs each task as soon as the tasks it depends on have finished; results are passed in by name
+    def __init__(self, name="task graph", max_workers=4):
+        self.name = name
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.timings = {}
+
+    def add(self, name, func, depends_on=()):
+        for dependency in depends_on:
+            if dependency not in self.tasks:
+                raise ValueError(f"Task {name} depends on unknown task {dependency}")
+        self.tasks[name] = (func, tuple(depends_on))
+        return self
+
+    def timed(self, name, func, started_at, arguments):
+        task_started = time.monotonic()
+        try:
+            return func(**arguments)
+        finally:
+            finished = time.monotonic()
+            self.timings[name] = (task_started - started_at, finished - started_at)
+
+    def run(self):
+        started_at = time.monotonic()
+        results = {}
+        pending = dict(self.tasks)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, (func, depends_on) in list(pending.items()):
+                    if all(dependency in results for dependency in depends_on):
+                        arguments = {dependency: results[dependency] for dependency in depends_on}
+                        running[executor.submit(self.timed, name, func, started_at, arguments)] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    # A failed task stops the graph; tasks already running finish before the error surfaces
+                    results[name] = future.result()
+
+        self.report(time.monotonic() - started_at)
+        return results
+
+    def report(self, total):
+        print(f"{self.name} finished in {total:.1f}s:")
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1]):
+            print(f"  {name}: {end - start:.1f}s (from {start:.1f}s to {end:.1f}s)")
@@ -1,10 +1,11 @@
 import os
 import json
-import pickle
-import requests
 import time
 import pandas as pd
 from dotenv import load_dotenv
+from class_apollo_client import ApolloClient
+from class_enrichment_cache import EnrichmentCache
+from class_lead_store import LeadStore
 
 print("Loading environment variables from .env file...")
 # Load environment variables from .env file
@@ -14,29 +15,26 @@ print("Getting the Apollo.io API key from the environment variable...")
 # Get the Apollo.io API key from the environment variable
 api_key = os.getenv("APOLLO_API_KEY")
 
+# Shared Apollo.io client with a pooled session, rate limiting, retries and an on-disk cache
+cache = EnrichmentCache(
+    os.getenv("APOLLO_CACHE_FILE", "apollo_cache.sqlite"),
+    ttl_days=int(os.getenv("APOLLO_CACHE_TTL_DAYS", "30")),
+    max_entries=int(os.getenv("APOLLO_CACHE_MAX_ENTRIES", "100000"))
+)
+client = ApolloClient(api_key, cache=cache)
+
 def enrich_company_data(company_data):
     print("Enriching company data using Apollo.io...")
-    enriched_data = []
+    websites = list(company_data['Website'])
     
-    for _, row in company_data.iterrows():
-        website = row['Website']
-        
-        print(f"Making a request to the Apollo.io Organization Enrichment endpoint for domain: {website}...")
-        # Make a request to the Apollo.io Organization Enrichment endpoint
-        url = "https://api.apollo.io/v1/organizations/enrich"
-        querystring = {
-            "api_key": api_key,
-            "domain": website
-        }
-        headers = {
-            'Cache-Control': 'no-cache',
-            'Content-Type': 'application/json'
-        }
-        response = requests.request("GET", url, headers=headers, params=querystring)
-        
-        if response.status_code == 200:
+    # Make batched requests to the Apollo.io Organization Bulk Enrichment endpoint, mapped back to rows by index
+    results = client.organizations_bulk_enrich(websites)
+    
+    enriched_data = []
+    for website, enriched_company_data in zip(websites, results):
+        if enriched_company_data is not None:
             print(f"Successfully retrieved enriched data for domain: {website}")
-            enriched_company_data = response.json()
+            enriched_company_data = dict(enriched_company_data)
             enriched_company_data['website'] = website  # Add the 'website' key to the enriched data
             enriched_data.append(enriched_company_data)
         else:
@@ -47,32 +45,19 @@ def enrich_company_data(company_data):
 
 def find_person_by_role(domain, role):
     print(f"Finding {role} for domain: {domain}...")
-    url = "https://api.apollo.io/v1/mixed_people/search"
-    data = {
-        "api_key": api_key,
-        "q_organization_domains": domain,
-        "page": 1,
-        "per_page": 100,
-        "person_titles": [role]
-    }
-    headers = {
-        'Cache-Control': 'no-cache',
-        'Content-Type': 'application/json'
-    }
-    response = requests.request("POST", url, headers=headers, json=data)
+    person_data = client.mixed_people_search(domain, role)
     
-    if response.status_code == 200:
+    if person_data is not None:
         print(f"Successfully retrieved {role} data for domain: {domain}")
-        return response.json()
+        return person_data
     else:
         print(f"Error retrieving {role} data for domain: {domain}")
         return None
 
 def main():
-    print("Loading company_data dataframe from the pickle file...")
-    # Load the company_data dataframe from the pickle file
-    with open("companies_data.pkl", "rb") as file:
-        company_data = pickle.load(file)
+    print("Reading company_data from the Parquet store...")
+    # Only the Website column is needed for enrichment
+    company_data = LeadStore.companies().read(columns=['Website'])
     
     print("Enriching the company data using Apollo.io...")
     # Enrich the company data using Apollo.io
@@ -81,18 +66,14 @@ def main():
     print("Displaying the head of the enriched_data dataframe:")
     print(pd.DataFrame(enriched_data).head())
     
-    print("Loading individuals_data dataframe from the pickle file...")
-    # Load the individuals_data dataframe from the pickle file
-    with open("individuals_data.pkl", "rb") as file:
-        individuals_data = pickle.load(file)
-    
     role = input("Company Data enriched, now enter the role you want to search for in the enriched companies - this will be appended to individual data (default is 'CEO'): ") or "CEO"
     print(f"Searching for {role} for each company...")
     
-    for company in enriched_data:
-        website = company['website']
-        person_data = find_person_by_role(website, role)
-        
+    new_individuals = []
+    websites = [company['website'] for company in enriched_data]
+    people_data = client.map_concurrent(lambda website: find_person_by_role(website, role), websites)
+    
+    for website, person_data in zip(websites, people_data):
         if person_data:
             for person in person_data['people']:
                 name = person.get('name')
@@ -101,21 +82,22 @@ def main():
                 
                 if name and (email or linkedin_url):
                     print(f"Appending {role} data for domain: {website}")
-                    individuals_data = individuals_data.append({
-                        'name': name,
-                        'email': email,
-                        'linkedin_url': linkedin_url
-                    }, ignore_index=True)
-    
-    print("Displaying the head of the updated individuals_data dataframe:")
-    print(individuals_data.head())
+                    new_individuals.append({
+                        'Name': name,
+                        'Email': email,
+                        'LinkedIn': linkedin_url
+                    })
     
-    print("Saving the updated individuals_data to the existing pickle file...")
-    # Save the updated individuals_data to the existing pickle file
-    with open("individuals_data.pkl", "wb") as file:
-        pickle.dump(individuals_data, file)
+    new_individuals = pd.DataFrame(new_individuals, columns=['Name', 'Email', 'LinkedIn'])
+    print("Displaying the head of the individuals being appended:")
+    print(new_individuals.head())
     
-    print("Updated individuals_data saved to 'individuals_data.pkl'")
+    if not new_individuals.empty:
+        print("Appending the new individuals to the individuals_data Parquet store...")
+        # Append a new part file instead of rewriting the whole store
+        LeadStore.individuals().append(new_individuals)
+        print(f"{len(new_individuals)} individuals appended to 'individuals_data.parquet'")
+    client.close()
 
 if __name__ == '__main__':
     print("Starting the main function...")
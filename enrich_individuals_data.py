@@ -1,10 +1,10 @@
 import os
-import json
-import pickle
-import requests
-import time
 import pandas as pd
 from dotenv import load_dotenv
+from class_apollo_client import ApolloClient
+from class_enrichment_cache import EnrichmentCache, linkedin_slug, normalize_email
+from class_jsonl_store import ResumableJsonlWriter
+from class_lead_store import LeadStore
 
 print("Loading environment variables from .env file...")
 # Load environment variables from .env file
@@ -14,68 +14,94 @@ print("Getting the Apollo.io API key from the environment variable...")
 # Get the Apollo.io API key from the environment variable
 api_key = os.getenv("APOLLO_API_KEY")
 
-def enrich_individual_data(individual_data):
+# Shared Apollo.io client with a pooled session, rate limiting, retries and an on-disk cache
+cache = EnrichmentCache(
+    os.getenv("APOLLO_CACHE_FILE", "apollo_cache.sqlite"),
+    ttl_days=int(os.getenv("APOLLO_CACHE_TTL_DAYS", "30")),
+    max_entries=int(os.getenv("APOLLO_CACHE_MAX_ENTRIES", "100000"))
+)
+client = ApolloClient(api_key, cache=cache)
+
+def individual_details(row):
+    first_name = row['Name'].split()[0] if pd.notna(row['Name']) else None
+    last_name = ' '.join(row['Name'].split()[1:]) if pd.notna(row['Name']) else None
+    email = row['Email'] if pd.notna(row['Email']) else None
+    linkedin_url = row['LinkedIn'] if pd.notna(row['LinkedIn']) else None
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": email,
+        "linkedin_url": linkedin_url
+    }
+
+def individual_key(detail, name_counts):
+    email = normalize_email(detail['email'])
+    if email:
+        return f"email:{email}"
+    slug = linkedin_slug(detail['linkedin_url'])
+    if slug:
+        return f"linkedin:{slug}"
+    if not detail['first_name']:
+        return None
+    # Different people can share a name, so each occurrence of a name in the input gets its own key
+    name = f"{detail['first_name']} {detail['last_name']}".lower()
+    name_counts[name] = name_counts.get(name, 0) + 1
+    return f"name:{name}#{name_counts[name]}"
+
+def enrich_individual_data(individual_batches, writer, chunk_size=100):
     print("Enriching individual data using Apollo.io...")
-    enriched_data = []
+    pending = []
+    
+    def flush():
+        # Make batched requests to the Apollo.io People Bulk Enrichment endpoint, mapped back to rows by index
+        results = client.people_bulk_match([detail for _, detail in pending])
+        for (key, detail), enriched_individual_data in zip(pending, results):
+            if enriched_individual_data is None:
+                # Left out of the checkpoint so the next run retries it
+                print(f"Error enriching data for: {detail['first_name']} {detail['last_name']}")
+            elif enriched_individual_data.get("person") is None:
+                print(f"No match found for: {detail['first_name']} {detail['last_name']}")
+                writer.mark_done(key)
+            else:
+                print(f"Successfully retrieved enriched data for: {detail['first_name']} {detail['last_name']}")
+                writer.write(key, enriched_individual_data)
+        pending.clear()
     
-    for _, row in individual_data.iterrows():
-        first_name = row['Name'].split()[0] if pd.notna(row['Name']) else None
-        last_name = ' '.join(row['Name'].split()[1:]) if pd.notna(row['Name']) else None
-        email = row['Email'] if pd.notna(row['Email']) else None
-        linkedin_url = row['LinkedIn'] if pd.notna(row['LinkedIn']) else None
-        
-        print(f"Making a request to the Apollo.io People Enrichment endpoint for: {first_name} {last_name}")
-        # Make a request to the Apollo.io People Enrichment endpoint
-        url = "https://api.apollo.io/v1/people/match"
-        data = {
-            "api_key": api_key,
-            "first_name": first_name,
-            "last_name": last_name,
-            "email": email,
-            "linkedin_url": linkedin_url,
-            "reveal_personal_emails": True
-        }
-        headers = {
-            'Cache-Control': 'no-cache',
-            'Content-Type': 'application/json'
-        }
-        response = requests.request("POST", url, headers=headers, json=data)
-        
-        if response.status_code == 200:
-            print(f"Successfully retrieved enriched data for: {first_name} {last_name}")
-            enriched_individual_data = response.json()
-            enriched_data.append(enriched_individual_data)
-        else:
-            print(f"Error enriching data for: {first_name} {last_name}")
+    # Stream rows through in chunks so memory stays flat and every finished record is on disk
+    name_counts = {}
+    for individual_data in individual_batches:
+        for _, row in individual_data.iterrows():
+            detail = individual_details(row)
+            key = individual_key(detail, name_counts)
+            if key is None:
+                print("Skipping a row with no name, email or LinkedIn URL.")
+                continue
+            if writer.is_done(key):
+                continue
+            pending.append((key, detail))
+            if len(pending) >= chunk_size:
+                flush()
+    if pending:
+        flush()
     
     print("Finished enriching individual data.")
-    return enriched_data
 
 def main():
-    print("Loading individuals_data dataframe from the pickle file...")
-    # Load the individuals_data dataframe from the pickle file
-    with open("individuals_data.pkl", "rb") as file:
-        individuals_data = pickle.load(file)
-    
-    print("Enriching the individual data using Apollo.io...")
-    # Enrich the individual data using Apollo.io
-    enriched_data = enrich_individual_data(individuals_data)
-    
-    print("Displaying the head of the enriched_data:")
-    print(pd.DataFrame(enriched_data).head())
-    
-    # Get the current epoch time
-    epoch_time = int(time.time())
-    
-    # Create the file name with the epoch time
-    file_name = f"individuals_data_enriched_{epoch_time}.json"
+    print("Reading individuals_data from the Parquet store...")
+    # Read only the columns enrichment needs, one record batch at a time
+    store = LeadStore.individuals()
+    individuals_data = store.iter_batches(columns=['Name', 'Email', 'LinkedIn'])
     
-    print(f"Saving the enriched_data to {file_name}...")
-    # Save the enriched_data to a JSON file with the epoch time in the name
-    with open(file_name, "w") as file:
-        json.dump(enriched_data, file, indent=2)
+    try:
+        # Resume an interrupted run on the same input if there is one, otherwise start individuals_data_enriched_{epoch}.jsonl
+        with ResumableJsonlWriter.resume_or_create("individuals_data_enriched", store.fingerprint()) as writer:
+            print(f"Streaming the enriched data to {writer.output_file}...")
+            # Enrich the individual data using Apollo.io
+            enrich_individual_data(individuals_data, writer)
+    finally:
+        client.close()
     
-    print(f"Enriched individuals_data saved to '{file_name}'")
+    print(f"Enriched individuals_data saved to '{writer.output_file}' ({writer.written} new records)")
 
 
 if __name__ == '__main__':
@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
 import os
+import json
+import re
+import difflib
 import docx
-import pickle
+from concurrent.futures import ThreadPoolExecutor
 from PyPDF2 import PdfReader  # Updated import statement
 from anthropic import Client
 from dotenv import load_dotenv
+from class_lead_store import LeadStore
 
 
 # Load environment variables from .env file
@@ -17,6 +21,162 @@ api_key = os.getenv("ANTHROPIC_API_KEY")
 # Create an instance of the Anthropic client
 client = Client(api_key=api_key)
 
+INDIVIDUALS_COLUMNS = ['Name', 'Email', 'LinkedIn']
+COMPANIES_COLUMNS = ['Company', 'Website']
+
+# Chunks are capped by the records they are likely to produce as well as by size: each JSON record costs
+# ~35 output tokens, so ~60 records keep a reply well inside EXTRACTION_MAX_TOKENS. Dense attendee lists
+# hit the record cap long before the character cap; truncated replies are still split and retried.
+CHUNK_MAX_CHARS = int(os.getenv("INGEST_CHUNK_MAX_CHARS", "12000"))
+CHUNK_MAX_RECORDS = int(os.getenv("INGEST_CHUNK_MAX_RECORDS", "60"))
+EXTRACTION_WORKERS = int(os.getenv("INGEST_EXTRACTION_WORKERS", "4"))
+EXTRACTION_MAX_TOKENS = 4096
+
+# Emails, profile links and URLs each mark a record the reply will have to spell out
+RECORD_HINT_REGEX = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+|linkedin\.com/in/|https?://|www\.", re.IGNORECASE)
+
+def expected_records(text):
+    return len(RECORD_HINT_REGEX.findall(text))
+
+def chunk_text(sections, max_chars=CHUNK_MAX_CHARS, max_records=CHUNK_MAX_RECORDS):
+    # Pack whole pages/paragraphs into chunks, only splitting a section by lines when it is too big on its own
+    chunks = []
+    current = ''
+    current_records = 0
+    for section in sections:
+        too_big = len(section) > max_chars or expected_records(section) > max_records
+        pieces = section.split('\n') if too_big else [section]
+        for piece in pieces:
+            while len(piece) > max_chars:
+                if current:
+                    chunks.append(current)
+                    current = ''
+                    current_records = 0
+                chunks.append(piece[:max_chars])
+                piece = piece[max_chars:]
+            records = expected_records(piece)
+            if current and (len(current) + len(piece) + 1 > max_chars or current_records + records > max_records):
+                chunks.append(current)
+                current = ''
+                current_records = 0
+            current = f"{current}\n{piece}" if current else piece
+            current_records += records
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def record_key(record, fields):
+    for field in fields:
+        value = str(record.get(field) or '').strip().lower().rstrip('/')
+        if value:
+            return f"{field}:{value}"
+    return None
+
+def merge_records(records, key_fields):
+    # Deduplicate records found in several chunks, filling in blanks from later duplicates
+    merged = {}
+    for record in records:
+        key = record_key(record, key_fields)
+        if key is None:
+            continue
+        if key in merged:
+            for field, value in record.items():
+                if value and not merged[key].get(field):
+                    merged[key][field] = value
+        else:
+            merged[key] = dict(record)
+    return list(merged.values())
+
+def extract_records_from_sections(sections):
+    chunks = chunk_text(sections)
+    print(f"Extracting structured data from {len(chunks)} chunk(s) with up to {EXTRACTION_WORKERS} concurrent requests...")
+    with ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS) as executor:
+        results = list(executor.map(extract_records, chunks))
+
+    individuals = merge_records([record for result, _ in results for record in result], ['Email', 'LinkedIn', 'Name'])
+    companies = merge_records([record for _, result in results for record in result], ['Website', 'Company'])
+    return individuals, companies
+
+def extract_records(text):
+    # Use Claude 3 to extract structured data from the text as a single JSON object
+    prompt = f"\n\nPlease extract individuals and companies data from the following text:\n\n{text}\n\nIndividuals data should include Name, Email, and LinkedIn. Companies data should include Company and Website.\n\nRespond with JSON only, in exactly this shape: {{\"individuals\": [{{\"Name\": \"\", \"Email\": \"\", \"LinkedIn\": \"\"}}], \"companies\": [{{\"Company\": \"\", \"Website\": \"\"}}]}}. Use an empty string for missing values."
+    message = client.messages.create(
+        model="claude-3-haiku-20240307",
+        max_tokens=EXTRACTION_MAX_TOKENS,
+        temperature=0,
+        system="You are a helpful AI that extracts structured data from text.",
+        messages=[
+            {"role": "user", "content": prompt},
+            # Prefill the opening brace so the reply is the JSON object and nothing else
+            {"role": "assistant", "content": "{"}
+        ]
+    )
+
+    response = "{" + message.content[0].text  # Extract the text content from the ContentBlock object
+    print(response)
+
+    if message.stop_reason == "max_tokens":
+        # The JSON was cut off; a smaller chunk fits in one reply, and a chunk that can't shrink keeps what did arrive
+        halves = split_chunk(text)
+        if halves:
+            print("Reply was truncated at max_tokens. Splitting the chunk in two and retrying...")
+            results = [extract_records(half) for half in halves]
+            return [record for individuals, _ in results for record in individuals], [record for _, companies in results for record in companies]
+        print("Reply was truncated at max_tokens. Keeping the complete records only.")
+        return parse_partial_json_response(response)
+
+    try:
+        return parse_json_response(response)
+    except ValueError:
+        print("Response was not valid JSON. Keeping the complete records only.")
+        return parse_partial_json_response(response)
+
+def split_chunk(text):
+    lines = text.split('\n')
+    if len(lines) < 2:
+        return None
+    middle = len(lines) // 2
+    return ['\n'.join(lines[:middle]), '\n'.join(lines[middle:])]
+
+def records_from_payload(payload):
+    individuals = [
+        {column: str(record.get(column) or '').strip() for column in INDIVIDUALS_COLUMNS}
+        for record in payload.get('individuals', []) if isinstance(record, dict) and record.get('Name')
+    ]
+    companies = [
+        {column: str(record.get(column) or '').strip() for column in COMPANIES_COLUMNS}
+        for record in payload.get('companies', []) if isinstance(record, dict) and record.get('Company')
+    ]
+    return individuals, companies
+
+def parse_json_response(response):
+    payload = json.loads(response[:response.rindex('}') + 1])
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    return records_from_payload(payload)
+
+def complete_objects(response, field):
+    # Decode the objects of one array up to the first one that is cut off or malformed
+    match = re.search(rf'"{field}"\s*:\s*\[', response)
+    if not match:
+        return []
+    decoder = json.JSONDecoder()
+    position = match.end()
+    objects = []
+    while True:
+        while position < len(response) and response[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(response) or response[position] != '{':
+            return objects
+        try:
+            value, position = decoder.raw_decode(response, position)
+        except ValueError:
+            return objects
+        objects.append(value)
+
+def parse_partial_json_response(response):
+    return records_from_payload({field: complete_objects(response, field) for field in ('individuals', 'companies')})
+
 def read_file(file):
     file_extension = os.path.splitext(file.name)[1].lower()
     
@@ -27,55 +187,19 @@ def read_file(file):
     elif file_extension in ['.txt', '.docx', '.pdf']:
         if file_extension == '.txt':
             with open(file.name, 'r') as f:
-                text = f.read()
+                sections = f.read().split('\n\n')
         elif file_extension == '.docx':
             doc = docx.Document(file)
-            text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+            sections = [paragraph.text for paragraph in doc.paragraphs]
         elif file_extension == '.pdf':
             pdf_reader = PdfReader(file)  # Updated class name
-            text = '\n'.join([pdf_reader.pages[i].extract_text() for i in range(len(pdf_reader.pages))])  # Updated method name
+            sections = [page.extract_text() or '' for page in pdf_reader.pages]  # One section per page
         
-        # Use Claude 3 to extract structured data from the text
-        prompt = f"\n\nPlease extract individuals and companies data from the following text:\n\n{text}\n\nIndividuals data should include Name, Email, and LinkedIn. Companies data should include Company and Website."
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=1024,
-            temperature=0,
-            system="You are a helpful AI that extracts structured data from text.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        response = message.content[0].text  # Extract the text content from the ContentBlock object
-        print(response)
-
-        individuals_data = pd.DataFrame(columns=['Name', 'Email', 'LinkedIn'])
-        companies_data = pd.DataFrame(columns=['Company', 'Website'])
-
-        lines = response.split('\n')  # Split the response into lines
-        for line in lines:
-            if 'Name:' in line:
-                name = line.split('Name:')[1].strip()
-                email = ''
-                linkedin = ''
-                for subline in lines[lines.index(line)+1:]:
-                    if 'Email:' in subline:
-                        email = subline.split('Email:')[1].strip()
-                    if 'LinkedIn:' in subline:
-                        linkedin = subline.split('LinkedIn:')[1].strip()
-                    if 'Name:' in subline or 'Company:' in subline:
-                        break
-                individuals_data = pd.concat([individuals_data, pd.DataFrame({'Name': [name], 'Email': [email], 'LinkedIn': [linkedin]})], ignore_index=True)
-            elif 'Company:' in line:
-                company = line.split('Company:')[1].strip()
-                website = ''
-                for subline in lines[lines.index(line)+1:]:
-                    if 'Website:' in subline:
-                        website = subline.split('Website:')[1].strip()
-                    if 'Name:' in subline or 'Company:' in subline:
-                        break
-                companies_data = pd.concat([companies_data, pd.DataFrame({'Company': [company], 'Website': [website]})], ignore_index=True)
+        individuals, companies = extract_records_from_sections(sections)
+
+        # Build each dataframe once from the collected records
+        individuals_data = pd.DataFrame(individuals, columns=INDIVIDUALS_COLUMNS)
+        companies_data = pd.DataFrame(companies, columns=COMPANIES_COLUMNS)
 
         data = pd.concat([individuals_data, companies_data], ignore_index=True)
 
@@ -84,15 +208,85 @@ def read_file(file):
     
     return data
 
-def split_data(data):
-    individuals_columns = ['Name', 'Email', 'LinkedIn']
-    companies_columns = ['Company', 'Website']
-    
-    # Strip whitespace from column names
-    data.columns = [col.strip() for col in data.columns]
-    
+COLUMN_MAPPING_CACHE_FILE = os.getenv("COLUMN_MAPPING_CACHE_FILE", "column_mapping_cache.json")
+
+# Header spellings seen in CRM exports, in normalized form (lowercase, letters and digits only)
+COLUMN_SYNONYMS = {
+    'Name': ['name', 'fullname', 'contactname', 'contact', 'person', 'personname'],
+    'Email': ['email', 'emailaddress', 'workemail', 'businessemail', 'mail', 'emails'],
+    'LinkedIn': ['linkedin', 'linkedinurl', 'linkedinprofile', 'linkedinprofileurl', 'personlinkedinurl'],
+    'Company': ['company', 'companyname', 'organization', 'organisation', 'organizationname', 'account', 'accountname', 'employer'],
+    'Website': ['website', 'companywebsite', 'domain', 'companydomain', 'websiteurl', 'url', 'web']
+}
+
+# Fuzzy matching only catches spelling variants; identifier columns like "Account ID" or "Company Number" never match
+FUZZY_MATCH_CUTOFF = 0.9
+IDENTIFIER_HEADER_REGEX = re.compile(r'(id|ids|number|no|code|count)$')
+
+# A mapping is usable when each side it touches has its key column: Email or LinkedIn need Name, Website needs Company
+REQUIRED_COLUMNS = {'Name': ['Email', 'LinkedIn'], 'Company': ['Website']}
+
+def normalize_header(column):
+    return re.sub(r'[^a-z0-9]', '', str(column).lower())
+
+def header_signature(columns):
+    return '|'.join(sorted(normalize_header(column) for column in columns))
+
+def load_column_mapping_cache():
+    if os.path.exists(COLUMN_MAPPING_CACHE_FILE):
+        with open(COLUMN_MAPPING_CACHE_FILE, 'r') as file:
+            return json.load(file)
+    return {}
+
+def save_column_mapping(columns, column_mapping):
+    cache = load_column_mapping_cache()
+    cache[header_signature(columns)] = {normalize_header(found): expected for found, expected in column_mapping.items()}
+    with open(COLUMN_MAPPING_CACHE_FILE, 'w') as file:
+        json.dump(cache, file, indent=2)
+
+def cached_column_mapping(columns):
+    cached = load_column_mapping_cache().get(header_signature(columns))
+    if cached is None:
+        return None
+    return {column: cached[normalize_header(column)] for column in columns if normalize_header(column) in cached}
+
+def match_columns(columns):
+    # Exact synonym matches first, then close fuzzy matches; each expected column is used at most once
+    column_mapping = {}
+    remaining = [column for column in columns if normalize_header(column)]
+    for expected_column, synonyms in COLUMN_SYNONYMS.items():
+        for column in remaining:
+            if normalize_header(column) in synonyms:
+                column_mapping[column] = expected_column
+                remaining.remove(column)
+                break
+
+    for expected_column, synonyms in COLUMN_SYNONYMS.items():
+        if expected_column in column_mapping.values():
+            continue
+        for column in remaining:
+            normalized = normalize_header(column)
+            # The LinkedIn column is any header mentioning linkedin
+            if expected_column == 'LinkedIn' and 'linkedin' in normalized:
+                matched = True
+            else:
+                matched = not IDENTIFIER_HEADER_REGEX.search(normalized) and difflib.get_close_matches(normalized, synonyms, n=1, cutoff=FUZZY_MATCH_CUTOFF)
+            if matched:
+                column_mapping[column] = expected_column
+                remaining.remove(column)
+                break
+
+    return column_mapping
+
+def mapping_is_complete(column_mapping):
+    mapped = set(column_mapping.values())
+    if not ({'Name', 'Company'} & mapped):
+        return False
+    return all(key_column in mapped or not (set(columns) & mapped) for key_column, columns in REQUIRED_COLUMNS.items())
+
+def llm_column_mapping(columns, individuals_columns, companies_columns):
     # Use Claude 3 to match the found column headers to the expected columns
-    prompt = f"\n\nGiven the following column headers from the data:\n\n{', '.join(data.columns)}\n\nYou must match each of them to one of the expected individuals columns verbatim: {', '.join(individuals_columns)}\nAnd to one of the expected companies columns verbatim: {', '.join(companies_columns)}\n\nProvide the mapping in the format 'Found Column: Expected Column' for each match.\n\nThe expected LinkedIn column must be matched to data which contains the string: linkedin or LinkedIn\n\nIf a match is not found then provide no data."
+    prompt = f"\n\nGiven the following column headers from the data:\n\n{', '.join(columns)}\n\nYou must match each of them to one of the expected individuals columns verbatim: {', '.join(individuals_columns)}\nAnd to one of the expected companies columns verbatim: {', '.join(companies_columns)}\n\nProvide the mapping in the format 'Found Column: Expected Column' for each match.\n\nThe expected LinkedIn column must be matched to data which contains the string: linkedin or LinkedIn\n\nIf a match is not found then provide no data."
     message = client.messages.create(
         model="claude-3-haiku-20240307",
         max_tokens=1024,
@@ -110,8 +304,33 @@ def split_data(data):
     lines = response.split('\n')  # Split the response into lines
     for line in lines:
         if ':' in line:
-            found_column, expected_column = line.split(':')
-            column_mapping[found_column.strip()] = expected_column.strip()
+            found_column, expected_column = line.rsplit(':', 1)
+            if found_column.strip() in columns:
+                column_mapping[found_column.strip()] = expected_column.strip()
+    return column_mapping
+
+def split_data(data):
+    individuals_columns = INDIVIDUALS_COLUMNS
+    companies_columns = COMPANIES_COLUMNS
+    
+    # Strip whitespace from column names
+    data.columns = [col.strip() for col in data.columns]
+    columns = list(data.columns)
+    
+    # Known header layouts are mapped from the cache, common ones by rule, and only unfamiliar ones by Claude
+    column_mapping = cached_column_mapping(columns)
+    if column_mapping is not None:
+        print("Using cached column mapping for this header layout.")
+    else:
+        column_mapping = match_columns(columns)
+        # A partial match, e.g. Email without Name for "First Name, Last Name", would drop every row, so Claude decides
+        if not mapping_is_complete(column_mapping):
+            print("No complete rule-based column mapping. Asking Claude to match the headers...")
+            column_mapping = llm_column_mapping(columns, individuals_columns, companies_columns)
+        # Only a complete mapping is reused, so a partial one is worked out again on the next upload
+        if mapping_is_complete(column_mapping):
+            save_column_mapping(columns, column_mapping)
+    print(f"Column mapping: {column_mapping}")
 
     individuals_data = pd.DataFrame(columns=individuals_columns)
     companies_data = pd.DataFrame(columns=companies_columns)
@@ -127,7 +346,6 @@ def split_data(data):
 
     return individuals_data, companies_data
 
-
 def main():
     st.title("Lead Data Ingestion")
     
@@ -141,14 +359,14 @@ def main():
             if not individuals_data.empty:
                 st.subheader("Individuals Data")
                 st.dataframe(individuals_data.head())
-                individuals_data.to_pickle("individuals_data.pkl")
-                st.success("Individuals data saved to 'individuals_data.pkl' (overwritten if already exists)")
+                LeadStore.individuals().write(individuals_data)
+                st.success("Individuals data saved to 'individuals_data.parquet' (overwritten if already exists)")
             
             if not companies_data.empty:
                 st.subheader("Companies Data")
                 st.dataframe(companies_data.head())
-                companies_data.to_pickle("companies_data.pkl")
-                st.success("Companies data saved to 'companies_data.pkl' (overwritten if already exists)")
+                LeadStore.companies().write(companies_data)
+                st.success("Companies data saved to 'companies_data.parquet' (overwritten if already exists)")
             
             if individuals_data.empty and companies_data.empty:
                 st.warning("No valid data found for individuals or companies.")